@@ -0,0 +1,132 @@
+import json
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+
+import pygame
+
+from asset_index_class import normalise_path
+
+ARCHIVE_FILENAME = 'assets.pak'
+
+
+class AssetArchive:
+    """
+    Every image the game loads, decoded once by pack_assets.py into one memory-mapped file
+    Surfaces are made straight from the mapped pixels - no file to open, no PNG to decode
+    Images that are missing from the archive, or that changed since it was packed, load from their PNG
+
+    File format:
+        MAGIC, format version (2 bytes), index length (4 bytes), JSON index, pixel blobs (64 byte aligned)
+    Index entries, by file name: content hash, size stored, whether it is opaque, blob offset
+    Pixels are BGRA, the byte order of 32 bit displays: transparent images are used from the mapping as they are,
+    opaque ones (alpha 255) get converted once by AssetManager unless the display has that same layout
+    Images with the same content and size share one blob
+    """
+    MAGIC = b'PW31PAK\0'
+    VERSION = 2
+    HEADER = struct.Struct('<8sHI')
+    ALIGNMENT = 64
+
+    def __init__(self, asset_index, filename=ARCHIVE_FILENAME):
+        self.asset_index = asset_index
+        self.filename = filename
+        self.entries = {}
+        self.data = None
+        self.open()
+
+    def open(self):
+        try:
+            with open(self.filename, 'rb') as input_file:
+                # Copy on write: pixels stay shared with the file unless something draws on them
+                data = mmap.mmap(input_file.fileno(), 0, access=mmap.ACCESS_COPY)
+        except (FileNotFoundError, ValueError):
+            return
+
+        try:
+            magic, version, index_length = self.HEADER.unpack_from(data)
+            if magic != self.MAGIC or version != self.VERSION:
+                raise ValueError('Not an archive this version can read')
+            entries = json.loads(data[self.HEADER.size:self.HEADER.size + index_length])
+            data_size = len(data) - self.data_start(index_length)
+            for entry in entries.values():
+                width, height = entry['size']
+                if entry['offset'] + width * height * 4 > data_size:
+                    raise ValueError('Archive is truncated')
+        except (struct.error, ValueError, KeyError, TypeError):
+            # Corrupt or half written - load the PNG files instead
+            data.close()
+            return
+        self.entries = entries
+        self.data = memoryview(data)[self.data_start(index_length):]
+
+    def load(self, filename):
+        entry = self.entries.get(normalise_path(filename))
+        if entry is None or self.asset_index.entry(filename)['hash'] != entry['hash']:
+            return pygame.image.load(filename)
+
+        width, height = entry['size']
+        surface = pygame.image.frombuffer(
+            self.data[entry['offset']:entry['offset'] + width * height * 4], (width, height), 'BGRA'
+        )
+        if entry['opaque']:
+            surface.set_alpha(None)
+        return surface
+
+    @classmethod
+    def pack(cls, asset_index, filenames, filename=ARCHIVE_FILENAME, sizes=None):
+        """
+        Decode filenames and write them to a new archive
+        sizes: size to store an image at, by file name - for images the game only uses scaled
+        The pixels go to a scratch file first, as the index in front of them is only known at the end
+        """
+        sizes = sizes or {}
+        entries = {}
+        # Offset of each blob written, by (content hash, size)
+        blobs = {}
+        offset = 0
+        with tempfile.TemporaryFile() as blob_file:
+            for name in sorted(normalise_path(name) for name in filenames):
+                content_hash = asset_index.entry(name)['hash']
+                image = pygame.image.load(name)
+                if image.get_colorkey() is not None:
+                    # Transparency that tobytes() would lose - leave it to the PNG
+                    continue
+                size = tuple(sizes.get(name, image.get_size()))
+                key = content_hash, size
+                if key not in blobs:
+                    if image.get_size() != size:
+                        image = pygame.transform.scale(image, size)
+                    # Images without alpha come out with alpha 255
+                    pixels = pygame.image.tobytes(image, 'BGRA')
+                    blobs[key] = offset, min(pixels[3::4]) == 255
+                    blob_file.write(pixels)
+                    blob_file.write(bytes(cls.aligned(len(pixels)) - len(pixels)))
+                    offset += cls.aligned(len(pixels))
+
+                blob_offset, opaque = blobs[key]
+                entries[name] = dict(hash=content_hash, size=list(size), opaque=opaque, offset=blob_offset)
+
+            index = json.dumps(entries, separators=(',', ':')).encode()
+            temporary_filename = filename + '.tmp'
+            with open(temporary_filename, 'wb') as output_file:
+                output_file.write(cls.HEADER.pack(cls.MAGIC, cls.VERSION, len(index)))
+                output_file.write(index)
+                output_file.write(bytes(cls.data_start(len(index)) - cls.HEADER.size - len(index)))
+                blob_file.seek(0)
+                shutil.copyfileobj(blob_file, output_file)
+        os.replace(temporary_filename, filename)
+        return entries
+
+    @classmethod
+    def data_start(cls, index_length):
+        """
+        Blob offsets in the index count from here
+        """
+        return cls.aligned(cls.HEADER.size + index_length)
+
+    @classmethod
+    def aligned(cls, length):
+        return -(-length // cls.ALIGNMENT) * cls.ALIGNMENT
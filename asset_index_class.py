@@ -0,0 +1,134 @@
+import glob
+import hashlib
+import json
+import os
+import threading
+
+from PIL import Image
+
+INDEX_FILENAME = 'asset_index.json'
+# Modification times differ per checkout, so they live in their own, untracked file
+MTIMES_FILENAME = 'asset_index_mtimes.json'
+ASSET_PATTERNS = [
+    'images/*.png',
+    'locations/*/images/*.png',
+    'mini_game_*/images/**/*.png',
+]
+
+
+def normalise_path(filename):
+    return os.path.normpath(filename).replace(os.sep, '/')
+
+
+class AssetIndex:
+    """
+    Image sizes, bounding boxes and content hashes, keyed by file name
+    Built once by build_asset_index.py; at runtime files whose mtime changed get hashed again,
+    and only those whose content hash changed too get opened with PIL again
+    """
+    def __init__(self, filename=INDEX_FILENAME, mtimes_filename=MTIMES_FILENAME):
+        self.filename = filename
+        self.mtimes_filename = mtimes_filename
+        self.entries = self.load(filename)
+        # Modification time each entry was last checked against, by file name
+        self.mtimes = self.load(mtimes_filename)
+        self.changed = False
+        self.mtimes_changed = False
+        # Images get loaded, and so looked up here, from background threads too
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def load(filename):
+        try:
+            with open(filename) as input_file:
+                return json.load(input_file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def save(self):
+        with self.lock:
+            self.save_files()
+
+    def save_files(self):
+        if self.changed:
+            with open(self.filename, 'w') as output_file:
+                json.dump(self.entries, output_file, indent=1, sort_keys=True)
+            self.changed = False
+        if self.mtimes_changed:
+            with open(self.mtimes_filename, 'w') as output_file:
+                json.dump(self.mtimes, output_file, indent=1, sort_keys=True)
+            self.mtimes_changed = False
+
+    @staticmethod
+    def content_hash(filename):
+        with open(filename, 'rb') as input_file:
+            return hashlib.sha1(input_file.read()).hexdigest()
+
+    @staticmethod
+    def scan(filename):
+        image = Image.open(filename)
+        bbox = image.getbbox()
+        return dict(
+            size=list(image.size),
+            bbox=list(bbox) if bbox else None
+        )
+
+    def entry(self, filename):
+        with self.lock:
+            return self.check_entry(normalise_path(filename))
+
+    def check_entry(self, filename):
+        mtime = os.path.getmtime(filename)
+        entry = self.entries.get(filename)
+        if entry is not None and self.mtimes.get(filename) == mtime:
+            return entry
+
+        content_hash = self.content_hash(filename)
+        if entry is None or entry['hash'] != content_hash:
+            entry = self.scan(filename)
+            entry['hash'] = content_hash
+            self.entries[filename] = entry
+            self.changed = True
+        self.mtimes[filename] = mtime
+        self.mtimes_changed = True
+        return entry
+
+    def size(self, filename):
+        return tuple(self.entry(filename)['size'])
+
+    def bbox(self, filename, scale_to=None):
+        """
+        Bounding box of the non-transparent area, optionally for the image scaled to scale_to (width, height)
+        """
+        entry = self.entry(filename)
+        bbox = entry['bbox']
+        if bbox is None:
+            return None
+        if scale_to is None:
+            return tuple(bbox)
+
+        width, height = entry['size']
+        x_scale = scale_to[0] / width
+        y_scale = scale_to[1] / height
+        return (
+            int(bbox[0] * x_scale),
+            int(bbox[1] * y_scale),
+            int(bbox[2] * x_scale),
+            int(bbox[3] * y_scale)
+        )
+
+    def build(self):
+        filenames = set()
+        for pattern in ASSET_PATTERNS:
+            for filename in glob.glob(pattern, recursive=True):
+                filenames.add(normalise_path(filename))
+
+        for filename in list(self.entries):
+            if filename not in filenames:
+                del self.entries[filename]
+                self.mtimes.pop(filename, None)
+                self.changed = True
+                self.mtimes_changed = True
+
+        for filename in sorted(filenames):
+            self.entry(filename)
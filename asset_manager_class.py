@@ -0,0 +1,66 @@
+import threading
+import weakref
+
+import pygame
+
+
+class AssetManager:
+    """
+    Loads every image, converted to the display's pixel format so blits need no conversion
+    An image in use by several objects is only loaded once
+
+    When the display format changes, version goes up: images loaded before that
+    should be loaded again
+    """
+    def __init__(self, asset_archive):
+        self.asset_archive = asset_archive
+        # Surfaces in use, by file name - they drop out once nothing refers to them
+        self.surfaces = weakref.WeakValueDictionary()
+        self.lock = threading.Lock()
+        self.display_format = None
+        self.alpha_format = None
+        self.version = 0
+
+    def update_display_format(self):
+        """
+        Call after (re)creating the window
+        Returns whether images loaded for an earlier window need loading again
+        """
+        screen = pygame.display.get_surface()
+        display_format = screen.get_bitsize(), screen.get_masks()
+        if display_format == self.display_format:
+            return False
+
+        changed = self.display_format is not None
+        alpha_surface = pygame.Surface((1, 1), pygame.SRCALPHA).convert_alpha()
+        with self.lock:
+            self.display_format = display_format
+            self.alpha_format = alpha_surface.get_bitsize(), alpha_surface.get_masks()
+            self.surfaces.clear()
+            self.version += 1
+        return changed
+
+    def convert(self, surface):
+        """
+        surface in the display format - itself if it already is, so mapped archive pixels stay shared
+        """
+        if self.display_format is None:
+            return surface
+        if surface.get_flags() & pygame.SRCALPHA:
+            if (surface.get_bitsize(), surface.get_masks()) == self.alpha_format:
+                return surface
+            return surface.convert_alpha()
+        if (surface.get_bitsize(), surface.get_masks()) == self.display_format:
+            return surface
+        return surface.convert()
+
+    def load(self, filename):
+        with self.lock:
+            surface = self.surfaces.get(filename)
+        if surface is not None:
+            return surface
+
+        surface = self.convert(self.asset_archive.load(filename))
+        with self.lock:
+            # Another thread may have loaded it meanwhile - share that one
+            return self.surfaces.setdefault(filename, surface)
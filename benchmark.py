@@ -0,0 +1,167 @@
+"""
+Headless benchmark: replays a script of input events and reports frame times per location and per mini-game
+
+python benchmark.py [script.yml] [--output results.json]
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+os.environ['SDL_VIDEODRIVER'] = 'dummy'
+os.environ['SDL_AUDIODRIVER'] = 'dummy'
+
+import pygame
+import yaml
+
+from game_class import Game
+from main import load_settings
+from settings_cache_class import SettingsCache
+
+
+class Benchmark:
+    def __init__(self, game, script):
+        self.game = game
+        self.script = script
+        self.frame_times = dict(locations={}, mini_games={})
+
+    def to_window(self, position):
+        x, y = position
+        return (
+            int(x * self.game.size[0] / 1920),
+            int(y * self.game.size[1] / 1080)
+        )
+
+    def game_to_screen(self, position):
+        location = self.game.active_location
+        x, y = location.settings['game_location']
+        width, height = location.settings['game_size']
+        return x + position[0] * width / 900, y + position[1] * height / 900
+
+    def map_position(self, location_id):
+        labels = self.game.map_labels
+        if labels.labels is None:
+            labels.prepare()
+        indexes = [index for index, label in enumerate(labels.labels) if label == location_id]
+        if not indexes:
+            raise ValueError(f'Location {location_id} is not on the map')
+        index = indexes[len(indexes) // 2]
+        return (
+            (index % labels.width) * labels.scale + labels.scale // 2,
+            (index // labels.width) * labels.scale + labels.scale // 2
+        )
+
+    def post_click(self, position):
+        position = self.to_window(position)
+        for event_type in [pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP]:
+            pygame.event.post(pygame.event.Event(event_type, pos=position, button=1))
+
+    def post_key(self, name):
+        key = getattr(pygame, f'K_{name}')
+        for event_type in [pygame.KEYDOWN, pygame.KEYUP]:
+            pygame.event.post(pygame.event.Event(event_type, key=key, mod=0, unicode=name, scancode=0))
+
+    def frame(self):
+        start = time.perf_counter()
+        self.game.update()
+        self.game.draw()
+        duration = time.perf_counter() - start
+
+        location = self.game.active_location
+        self.frame_times['locations'].setdefault(location.id, []).append(duration)
+        mini_game_id = location.settings.get('mini_game_id')
+        if mini_game_id is not None and not self.game.show_map:
+            self.frame_times['mini_games'].setdefault(mini_game_id, []).append(duration)
+
+    def run_step(self, step):
+        if 'frames' in step:
+            for _ in range(step['frames']):
+                self.frame()
+            return
+
+        if 'key' in step:
+            self.post_key(step['key'])
+        elif 'click' in step:
+            self.post_click(step['click'])
+        elif 'click_map' in step:
+            self.post_click(self.map_position(step['click_map']))
+        elif 'click_game' in step:
+            self.post_click(self.game_to_screen(step['click_game']))
+        else:
+            raise ValueError(f'Unknown benchmark step: {step}')
+        self.frame()
+
+    def run(self):
+        if self.script.get('unlock_all'):
+            for location in self.game.locations:
+                location.unlock()
+        for step in self.script['steps']:
+            self.run_step(step)
+
+    @staticmethod
+    def summary(frame_times):
+        frame_times = sorted(frame_times)
+
+        def percentile(p):
+            return frame_times[min(len(frame_times) - 1, int(len(frame_times) * p / 100))] * 1000
+
+        return dict(
+            frames=len(frame_times),
+            mean_ms=sum(frame_times) / len(frame_times) * 1000,
+            p50_ms=percentile(50),
+            p90_ms=percentile(90),
+            p99_ms=percentile(99),
+            max_ms=frame_times[-1] * 1000
+        )
+
+    def results(self):
+        return dict(
+            python=platform.python_version(),
+            pygame=pygame.version.ver,
+            script=self.script.get('name'),
+            locations={
+                str(id): self.summary(frame_times)
+                for id, frame_times in sorted(self.frame_times['locations'].items())
+            },
+            mini_games={
+                str(id): self.summary(frame_times)
+                for id, frame_times in sorted(self.frame_times['mini_games'].items())
+            }
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay scripted input without a window and report frame times')
+    parser.add_argument('script', nargs='?', default='benchmarks/default.yml')
+    parser.add_argument('--output', help='write the results to this JSON file instead of stdout')
+    args = parser.parse_args()
+
+    with open(args.script) as input_file:
+        script = yaml.load(input_file, Loader=yaml.Loader)
+    script.setdefault('name', args.script)
+
+    start = time.perf_counter()
+    settings_cache = SettingsCache()
+    settings = load_settings(settings_cache)
+    # Always start from a new game, and leave the player's save alone
+    settings['autosave'] = dict(settings.get('autosave', {}), enabled=False)
+    game = Game(settings, settings_cache)
+    startup_time = time.perf_counter() - start
+
+    benchmark = Benchmark(game, script)
+    benchmark.run()
+    results = benchmark.results()
+    results['startup_ms'] = startup_time * 1000
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,18 @@
+import glob
+
+from asset_index_class import AssetIndex
+from map_labels_class import MapLabels
+
+
+index = AssetIndex()
+index.build()
+
+map_filenames = {
+    int(filename.split('location_')[1][:3]): filename
+    for filename in glob.glob('locations/location_*/images/map.png')
+}
+map_labels = MapLabels(index, map_filenames)
+map_labels.prepare()
+
+index.save()
+print(f'{len(index.entries)} assets in {index.filename}, map labels in {map_labels.filename}')
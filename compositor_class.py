@@ -0,0 +1,112 @@
+import math
+
+import pygame
+
+
+class Compositor:
+    """
+    Retained 1920x1080 frame, only redrawn and pushed to the window where it was invalidated
+    """
+    # Beyond this many dirty rectangles, redraw their union instead
+    max_rects = 8
+
+    def __init__(self, scaled_cache, profiler, size=(1920, 1080)):
+        self.scaled_cache = scaled_cache
+        self.profiler = profiler
+        self.frame = pygame.Surface(size)
+        self.area = self.frame.get_rect()
+        self.dirty_rects = []
+        # Incremented whenever the frame is redrawn, so its scaled copy can be reused until then
+        self.version = 0
+        self.exposed = False
+
+    def invalidate(self, rect=None):
+        rect = self.area if rect is None else self.area.clip(rect)
+        if rect.width and rect.height:
+            self.dirty_rects.append(rect)
+
+    def expose(self):
+        """
+        The window needs the whole frame again, but the frame itself did not change
+        """
+        self.exposed = True
+
+    @property
+    def dirty(self):
+        return bool(self.dirty_rects) or self.exposed
+
+    def dirty_areas(self):
+        if len(self.dirty_rects) > self.max_rects:
+            return [self.dirty_rects[0].unionall(self.dirty_rects[1:])]
+
+        result = []
+        for rect in sorted(self.dirty_rects, key=lambda rect: rect.width * rect.height, reverse=True):
+            if not any(other.contains(rect) for other in result):
+                result.append(rect)
+        return result
+
+    def to_screen(self, rect, screen_size):
+        """
+        Window area showing rect, widened to where window and frame pixel edges line up
+        Scaling the frame maps window pixel x to frame pixel x * frame width // window width,
+        so the frame pixels behind such an area scale to exactly what a full frame update shows
+        """
+        left, right = self.aligned_span(rect.left, rect.right, self.area.width, screen_size[0])
+        top, bottom = self.aligned_span(rect.top, rect.bottom, self.area.height, screen_size[1])
+        return pygame.Rect(left, top, right - left, bottom - top)
+
+    @staticmethod
+    def aligned_span(start, end, frame_length, screen_length):
+        # Every step window pixels line up with a frame pixel boundary again
+        step = screen_length // math.gcd(frame_length, screen_length)
+        start = start * screen_length // frame_length // step * step
+        end = min(-(-end * screen_length // frame_length // step) * step, screen_length)
+        return start, end
+
+    def to_frame(self, screen_rect, screen_size):
+        """
+        Part of the frame shown in screen_rect, from to_screen()
+        """
+        left = screen_rect.left * self.area.width // screen_size[0]
+        top = screen_rect.top * self.area.height // screen_size[1]
+        right = screen_rect.right * self.area.width // screen_size[0]
+        bottom = screen_rect.bottom * self.area.height // screen_size[1]
+        return pygame.Rect(left, top, right - left, bottom - top)
+
+    def render(self, screen, draw_layers):
+        """
+        Redraw the dirty parts of the frame with draw_layers(frame), clipped to each
+        dirty rectangle, then copy just those parts to the screen
+        Returns the screen areas to update on the display
+        """
+        screen_size = screen.get_size()
+        rects = self.dirty_areas()
+        for rect in rects:
+            self.frame.set_clip(rect)
+            draw_layers(self.frame)
+        self.frame.set_clip(None)
+        self.dirty_rects = []
+        if rects:
+            self.version += 1
+
+        if self.exposed or rects == [self.area]:
+            self.exposed = False
+            with self.profiler.phase('scale'):
+                image = self.scaled_cache.get('frame', self.version, screen_size, lambda: self.frame)
+                screen.blit(image, (0, 0))
+            return [screen.get_rect()]
+
+        updated = []
+        with self.profiler.phase('scale'):
+            for rect in rects:
+                screen_rect = self.to_screen(rect, screen_size)
+                if not screen_rect.width or not screen_rect.height:
+                    continue
+                # Scaled at the same ratio and offset as a full frame update, so no seams at the edges
+                source_rect = self.to_frame(screen_rect, screen_size)
+                image = self.frame.subsurface(source_rect)
+                if screen_rect.size != source_rect.size:
+                    image = pygame.transform.scale(image, screen_rect.size)
+                screen.blit(image, screen_rect)
+                updated.append(screen_rect)
+        return updated
@@ -0,0 +1,98 @@
+import collections
+import contextlib
+import csv
+import json
+import time
+
+import pygame
+
+PHASES = ['events', 'location', 'mini_game', 'map', 'scale', 'flip']
+
+
+class FrameProfiler:
+    """
+    Time spent in each phase of a frame, kept for the last max_frames frames
+    Nested phases are included in their parent: location includes mini_game
+    While not enabled, phase() hands out a shared do-nothing context manager
+    """
+    overlay_line_height = 28
+
+    def __init__(self, enabled=False, max_frames=900, dump_filename=None):
+        self.enabled = enabled
+        self.frames = collections.deque(maxlen=max_frames)
+        self.dump_filename = dump_filename
+        self.current = None
+        self.frame_start = None
+        self.show_overlay = False
+        self.overlay_area = pygame.Rect(10, 10, 380, self.overlay_line_height * (len(PHASES) + 2))
+        self.font = None
+        self.null_phase = contextlib.nullcontext()
+
+    def start_frame(self):
+        if not self.enabled:
+            return
+        self.current = dict.fromkeys(PHASES, 0.0)
+        self.frame_start = time.perf_counter()
+
+    def end_frame(self):
+        if self.current is None:
+            return
+        self.current['total'] = time.perf_counter() - self.frame_start
+        self.frames.append(self.current)
+        self.current = None
+
+    def phase(self, name):
+        if self.current is None:
+            return self.null_phase
+        return self.timer(name)
+
+    @contextlib.contextmanager
+    def timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.current[name] += time.perf_counter() - start
+
+    def toggle_overlay(self):
+        self.show_overlay = not self.show_overlay
+        if self.show_overlay:
+            self.enabled = True
+
+    def averages(self, frame_count=15):
+        """
+        Average milliseconds per phase over the last frame_count frames
+        """
+        frames = list(self.frames)[-frame_count:]
+        return {
+            name: sum(frame[name] for frame in frames) / len(frames) * 1000 if frames else 0.0
+            for name in PHASES + ['total']
+        }
+
+    def draw_overlay(self, frame):
+        if self.font is None:
+            self.font = pygame.font.SysFont('Courier New', 24, bold=True)
+
+        frame.fill('Black', self.overlay_area)
+        x, y = self.overlay_area.left + 10, self.overlay_area.top + 10
+        for name, milliseconds in self.averages().items():
+            text = self.font.render(f'{name:<10} {milliseconds:7.2f} ms', True, 'White')
+            frame.blit(text, (x, y))
+            y += self.overlay_line_height
+
+    def dump(self):
+        if not self.dump_filename or not self.frames:
+            return
+
+        columns = PHASES + ['total']
+        if self.dump_filename.endswith('.csv'):
+            with open(self.dump_filename, 'w', newline='') as output_file:
+                writer = csv.DictWriter(output_file, fieldnames=columns)
+                writer.writeheader()
+                writer.writerows(self.frames)
+        else:
+            with open(self.dump_filename, 'w') as output_file:
+                json.dump(dict(phases=columns, frames=[
+                    [frame[name] for name in columns]
+                    for frame in self.frames
+                ]), output_file)
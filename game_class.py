@@ -1,44 +1,114 @@
+import concurrent.futures
 import os
 
 import pygame
 pygame.init()
 
 import location_class
+from asset_archive_class import AssetArchive
+from asset_index_class import AssetIndex
+from asset_manager_class import AssetManager
+from compositor_class import Compositor
+from frame_profiler_class import FrameProfiler
+from location_graph_class import LocationGraph
+from map_labels_class import MapLabels
+from memory_overlay_class import MemoryOverlay
+from mini_game_registry_class import MiniGameRegistry
+from save_game_class import SaveGame
+from scaled_surface_cache_class import ScaledSurfaceCache
+from settings_cache_class import SettingsCache
+from surface_loader_class import SurfaceLoader, surface_bytes
+from world_map_class import WorldMap
 
 
 class Game:
-    def __init__(self, settings):
+    def __init__(self, settings, settings_cache=None):
         self.settings = settings
+        # Location settings come from here
+        self.settings_cache = settings_cache if settings_cache is not None else SettingsCache()
         self.fullscreen = settings['screen'].get('fullscreen', False)
         self.size = None if self.fullscreen else (settings['screen']['width'], settings['screen']['height'])
+        self.asset_index = AssetIndex()
+        self.asset_archive = AssetArchive(self.asset_index)
+        self.assets = AssetManager(self.asset_archive)
+        self.surface_loader = SurfaceLoader(
+            self.assets, self.asset_index, settings.get('memory_budget_mb', 256) * 1024 * 1024
+        )
+        self.mini_games = MiniGameRegistry()
+        # Builds mini-games for newly unlocked locations
+        self.preloader = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        profiling = settings.get('profiling', {})
+        self.profiler = FrameProfiler(
+            enabled=profiling.get('enabled', False),
+            max_frames=profiling.get('frames', 900),
+            dump_filename=profiling.get('dump')
+        )
+        self.scaled_cache = ScaledSurfaceCache()
+        self.memory_overlay = MemoryOverlay()
+        self.compositor = Compositor(self.scaled_cache, self.profiler)
+        self.last_size = None
+        self.screen = None
+        # Open the window before loading any images, so they get converted to its format
+        self.initialise_screen(self.size)
+        self.show_map = False
+        self.world_map = WorldMap(self)
 
-        self.locations = []
+        locations = []
         for name in os.listdir('locations'):
             if name.startswith('location_'):
                 id = int(name.split('_')[1])
-                self.locations.append(location_class.Location(id, self))
-        for location in self.locations:
-            location.set_next_locations()
-        self.active_location = next(
-            location
-            for location in self.locations
-            if location.id == settings['initial_location_id']
+                locations.append(location_class.Location(id, self))
+        self.locations = LocationGraph(locations, settings['location_tree'], settings['initial_location_id'])
+        self.map_labels = MapLabels(
+            self.asset_index,
+            {location.id: location.image_path + 'map.png' for location in self.locations}
+        )
+        autosave = settings.get('autosave', {})
+        self.save_game = SaveGame(
+            self,
+            enabled=autosave.get('enabled', True),
+            filename=autosave.get('filename', 'save_game.bin'),
+            interval=autosave.get('interval', 30000)
         )
-        self.active_location.unlocked = True
+        self.active_location = None
+        # Before anything gets unlocked: unlocking starts building the mini-game, which needs its saved state
+        saved_location = self.save_game.load()
+        initial_location = self.locations.get(settings['initial_location_id'])
+        initial_location.unlock()
+        self.set_active_location(saved_location or initial_location)
+        # Ready before the first click on the map - after the first mini-game, which is needed sooner
+        self.map_labels.prefetch(self.preloader)
 
-        self.map_background = pygame.transform.scale(pygame.image.load('images/map_background.png'), (1920, 1080))
-        self.show_map = False
         self.done = False
-        self.last_size = None
-        self.screen = None
-        self.initialise_screen(self.size)
+        # Mini-games that support it draw straight into the window at its real size
+        self.direct_rendering = settings.get('direct_rendering', False)
+        self.idle_mode = settings.get('idle_mode', False)
+        # Wake up at least this often (milliseconds) while idle
+        self.idle_timeout = settings.get('idle_timeout', 1000)
+        # Window position of the last mouse button event
+        self.mouse_position = (0, 0)
         self.game_active = True
 
     def location_for_id(self, id):
-        for location in self.locations:
-            if location.id == id:
-                return location
-        return None
+        return self.locations.get(id)
+
+    def set_active_location(self, location):
+        if self.active_location is not None:
+            self.world_map.invalidate(self.active_location)
+        self.active_location = location
+        self.world_map.invalidate(location)
+        self.compositor.invalidate()
+        # Keep the images the player is likely to need next around, and start decoding them
+        nearby = [location] + location.next_locations
+        self.surface_loader.pin(
+            lazy_surface for nearby_location in nearby for lazy_surface in nearby_location.pinned_surfaces()
+        )
+        for nearby_location in nearby:
+            nearby_location.prefetch_images()
+        # Scaled mini-games of locations further away get made again when the player gets there
+        for key in self.scaled_cache.keys():
+            if isinstance(key, location_class.Location) and key not in nearby:
+                self.scaled_cache.discard(key)
 
     def toggle_full_screen(self):
         self.fullscreen = not self.fullscreen
@@ -56,18 +126,88 @@ class Game:
         else:
             self.screen = pygame.display.set_mode(screen_size, pygame.RESIZABLE)
         self.size = self.screen.get_size()
+        self.update_display_format()
+        self.scaled_cache.clear()
+        self.compositor.expose()
 
-    def draw(self):
-        screen_image = self.active_location.draw()
+    def update_display_format(self):
+        if self.assets.update_display_format():
+            self.reload_images()
+        self.compositor.frame = self.assets.convert(self.compositor.frame)
+
+    def reload_images(self):
+        """
+        The display format changed - images held on to were converted for the old one
+        Lazy surfaces reload by themselves
+        """
+        self.world_map.reload_images()
+        for location in self.locations:
+            location.reload_images()
+
+    def memory_report(self):
+        """
+        Lines about the memory used by images: the surface loader's, within the budget, and those held elsewhere
+        """
+        megabyte = 1024 * 1024
+        lines = [
+            f'Surfaces: {self.surface_loader.resident_bytes / megabyte:.1f} MB '
+            f'of {self.surface_loader.memory_budget / megabyte:.0f} MB budget'
+        ]
+        for filename, memory_size, pinned in self.surface_loader.report():
+            lines.append(f"  {memory_size / megabyte:6.1f} MB  {'pinned' if pinned else '      '}  {filename}")
+
+        held = [
+            ('map layer', surface_bytes(self.world_map.background)
+             + (surface_bytes(self.world_map.image) if self.world_map.image else 0)),
+            ('frame', surface_bytes(self.compositor.frame)),
+            ('scaled copies', self.scaled_cache.memory_size()),
+            # Not counting mini-games drawing straight into the window
+            ('mini-games', sum(
+                surface_bytes(location.loaded_mini_game.canvas)
+                for location in self.locations
+                if location.loaded_mini_game is not None and location.loaded_mini_game.canvas.get_parent() is None
+            )),
+        ]
+        lines.append('Held elsewhere:')
+        for name, memory_size in held:
+            lines.append(f'  {memory_size / megabyte:6.1f} MB  {name}')
+        return lines
+
+    def draw_layers(self, frame):
+        with self.profiler.phase('location'):
+            self.active_location.draw(frame)
 
         if self.show_map:
-            map_image = self.draw_map()
-            # TODO: Scale map, put in correct location
-            screen_image.blit(map_image, (0, 0))
+            with self.profiler.phase('map'):
+                # TODO: Scale map, put in correct location
+                frame.blit(self.world_map.draw(), (0, 0))
+
+        if self.profiler.show_overlay:
+            self.profiler.draw_overlay(frame)
+
+        if self.memory_overlay.show:
+            self.memory_overlay.draw(frame)
+
+    def draw(self):
+        self.active_location.invalidate_changes()
+        if self.profiler.show_overlay:
+            self.compositor.invalidate(self.profiler.overlay_area)
+        if self.memory_overlay.show and self.memory_overlay.update(self.memory_report()):
+            self.compositor.invalidate(self.memory_overlay.area)
+
+        updated_rects = []
+        if self.compositor.dirty:
+            updated_rects = self.compositor.render(self.screen, self.draw_layers)
+
+        if not self.show_map and self.active_location.renders_direct():
+            with self.profiler.phase('mini_game'):
+                rect = self.active_location.draw_direct(self.screen, updated_rects)
+            if rect is not None:
+                updated_rects.append(rect)
 
-        screen_image = pygame.transform.scale(screen_image, self.size)
-        self.screen.blit(screen_image, (0, 0))
-        pygame.display.flip()
+        if updated_rects:
+            with self.profiler.phase('flip'):
+                pygame.display.update(updated_rects)
 
     def handle_key_event(self, key):
         if self.game_active:
@@ -75,7 +215,7 @@ class Game:
 
     def map_mouse_pos(self):
         # TODO: Maybe show map in a smaller area - and change this code
-        x, y = pygame.mouse.get_pos()
+        x, y = self.mouse_position
 
         # scale to the window size
         x = x / self.size[0] * 1920
@@ -86,12 +226,11 @@ class Game:
     def click_on_map(self, event):
         if event.type != pygame.MOUSEBUTTONUP:
             return
-        locations = [location for location in self.locations if location.mouse_in_area(self.map_mouse_pos())]
-        location = min(locations, key=lambda location: location.map_button_size())
-        if not location.unlocked:
+        location = self.location_for_id(self.map_labels.location_id_at(self.map_mouse_pos()))
+        if location is None or not location.unlocked:
             return
 
-        self.active_location = location
+        self.set_active_location(location)
 
     def handle_mouse_event(self, event):
         if self.game_active:
@@ -100,47 +239,81 @@ class Game:
             else:
                 self.active_location.handle_mouse_event(event)
 
-    def draw_map(self):
-        image = self.map_background.copy()
-        for location in self.locations:
-            if not location.unlocked:
-                continue
-            if self.active_location == location:
-                # TODO: Room within room - make white when not active
-                pygame.draw.rect(image, 'light green', location.map_button_area)
-            image.blit(location.map_image, (0, 0))
-        return image
-
     def toggle_help(self):
         pass
 
+    def handle_event(self, event):
+        if event.type == pygame.QUIT:
+            self.done = True
+
+        elif event.type == pygame.KEYUP:
+            if event.key == pygame.K_q:
+                self.done = True
+            elif event.key == pygame.K_m:
+                # TODO: Map button
+                self.show_map = not self.show_map
+                self.compositor.invalidate()
+            elif event.key == pygame.K_QUESTION:
+                self.toggle_help()
+            elif event.key == pygame.K_F3:
+                self.profiler.toggle_overlay()
+                self.compositor.invalidate(self.profiler.overlay_area)
+            elif event.key == pygame.K_F4:
+                self.memory_overlay.toggle()
+                self.compositor.invalidate(self.memory_overlay.area)
+            else:
+                self.handle_key_event(event.key)
+            # TODO: Get full screen mode working
+            # elif event.key == pygame.K_f:
+            #     self.toggle_full_screen()
+        elif event.type == pygame.VIDEORESIZE:
+            self.size = event.dict['size']
+            self.update_display_format()
+            self.scaled_cache.clear()
+            self.compositor.expose()
+
+        elif event.type == pygame.VIDEOEXPOSE:
+            self.compositor.expose()
+
+        elif event.type in [pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP]:
+            self.mouse_position = event.pos
+            self.handle_mouse_event(event)
+
     def update(self):
         for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                self.done = True
+            self.handle_event(event)
+        self.active_location.update()
 
-            elif event.type == pygame.KEYUP:
-                if event.key == pygame.K_q:
-                    self.done = True
-                elif event.key == pygame.K_m:
-                    # TODO: Map button
-                    self.show_map = not self.show_map
-                elif event.key == pygame.K_QUESTION:
-                    self.toggle_help()
-                else:
-                    self.handle_key_event(event.key)
-                # TODO: Get full screen mode working
-                # elif event.key == pygame.K_f:
-                #     self.toggle_full_screen()
-            elif event.type == pygame.VIDEORESIZE:
-                self.size = event.dict['size']
-
-            elif event.type in [pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP]:
-                self.handle_mouse_event(event)
+    def frame_rate(self):
+        """
+        Frames per second needed right now - None when nothing is animating, so the game can sleep until the next event
+        """
+        frame_rate = self.active_location.frame_rate()
+        if frame_rate is None and not self.idle_mode:
+            frame_rate = self.settings.get('frame_rate', 15)
+        return frame_rate
+
+    def wait_for_event(self):
+        if self.compositor.dirty or self.frame_rate() is not None:
+            return
+        event = pygame.event.wait(self.idle_timeout)
+        if event.type != pygame.NOEVENT:
+            self.handle_event(event)
 
     def run(self):
         clock = pygame.time.Clock()
         while not self.done:
-            self.update()
+            self.wait_for_event()
+            self.profiler.start_frame()
+            with self.profiler.phase('events'):
+                self.update()
             self.draw()
-            clock.tick(15)
+            self.profiler.end_frame()
+            self.save_game.update()
+            clock.tick(self.frame_rate() or self.settings.get('frame_rate', 15))
+        self.save_game.save()
+        self.save_game.shutdown()
+        self.profiler.dump()
+        self.asset_index.save()
+        self.surface_loader.shutdown()
+        self.preloader.shutdown(wait=False, cancel_futures=True)
@@ -1,7 +1,4 @@
-import yaml
-
 import pygame
-from PIL import Image
 
 
 class Location:
@@ -10,46 +7,89 @@ class Location:
         self.game = game
         self.path = f'locations/location_{id:03}/'
         self.image_path = f'{self.path}/images/'
-        # TODO: Lazy image loading
-        self.background = pygame.image.load(self.image_path + 'background.png')
-        self._map_image = None
-
-        # TODO: Convert PIL image to PyGame or vice versa
-        # .. or pre-calculate room boundaries
+        self.background = game.surface_loader.lazy(self.image_path + 'background.png')
+        self.map_surface = game.surface_loader.lazy(self.image_path + 'map.png', size=(1920, 1080))
+        self._map_area = None
         self._map_button_area = None
 
         self.unlocked = False
-        self.next_locations = []
         self.first_visit = True
         self.show_intro_text = True
-        self.intro_text_image = pygame.image.load(self.image_path + 'intro_text.png')
+        self.intro_text_image = game.surface_loader.lazy(self.image_path + 'intro_text.png')
 
         self._settings = None
         self._mini_game = None
+        # From the save file, for when the mini-game gets created
+        self.saved_mini_game_state = None
+        self._preloaded_mini_game = None
+        self.mini_game_version = 0
+        # Window area of the mini-game, and the window size it was worked out for
+        self._screen_rect = None
+        self._screen_rect_size = None
+        # Window surface and area the mini-game currently draws into, with direct rendering
+        self._direct_canvas_key = None
+
+    @property
+    def loaded_mini_game(self):
+        """
+        The mini-game if it has been created, without creating it
+        """
+        return self._mini_game
 
     def get_mini_game(self):
-        mini_game_id = self.settings.get('mini_game_id')
-        if mini_game_id is not None:
-            assert isinstance(mini_game_id, int)
-            game_name = f'mini_game_{mini_game_id:03}'
-            exec('import ' + game_name)
-            return locals()[game_name].Game(self)
+        mini_game = self.game.mini_games.create(self)
+        if mini_game is not None and self.saved_mini_game_state is not None:
+            try:
+                mini_game.load_state(self.saved_mini_game_state)
+            except (KeyError, IndexError, TypeError, ValueError):
+                # Saved before the level changed - start it afresh
+                self.saved_mini_game_state = None
+                mini_game = self.game.mini_games.create(self)
+        return mini_game
+
+    def save_state(self):
+        if self._mini_game is not None:
+            mini_game_state = self._mini_game.save_state()
+        else:
+            mini_game_state = self.saved_mini_game_state
+        return self.unlocked, self.first_visit, self.show_intro_text, mini_game_state
+
+    def load_state(self, unlocked, first_visit, show_intro_text, mini_game_state):
+        self.first_visit = first_visit
+        self.show_intro_text = show_intro_text
+        self.saved_mini_game_state = mini_game_state
+        if unlocked:
+            # Not unlock(): nothing gets preloaded for a location until the player is near it
+            self.unlocked = True
+            self.game.world_map.invalidate(self)
+
+    def preload(self):
+        """
+        Get settings, mini-game and images ready in the background, before the player arrives
+        """
+        if self._mini_game is None and self._preloaded_mini_game is None:
+            # Settings get loaded here, so the preloader thread only reads them
+            self.settings
+            self._preloaded_mini_game = self.game.preloader.submit(self.get_mini_game)
+        self.prefetch_images()
 
     @property
     def mini_game(self):
         if self._mini_game is None:
-            self._mini_game = self.get_mini_game()
+            if self._preloaded_mini_game is not None:
+                self._mini_game = self._preloaded_mini_game.result()
+            else:
+                self._mini_game = self.get_mini_game()
         return self._mini_game
 
     def load_settings(self):
-        with open(f'{self.path}settings.yml') as input_file:
-            settings = yaml.load(input_file, Loader=yaml.Loader)
+        settings = self.game.settings_cache.location_settings(f'{self.path}settings.yml')
 
-        game_area_image = Image.open(self.image_path + 'mini_game_area.png')
-        settings['game_location'] = game_area_image.getbbox()[0:2]
+        bbox = self.game.asset_index.bbox(self.image_path + 'mini_game_area.png')
+        settings['game_location'] = bbox[0:2]
         settings['game_size'] = (
-            game_area_image.getbbox()[2] - game_area_image.getbbox()[0],
-            game_area_image.getbbox()[3] - game_area_image.getbbox()[1]
+            bbox[2] - bbox[0],
+            bbox[3] - bbox[1]
         )
         return settings
 
@@ -61,9 +101,11 @@ class Location:
 
     @property
     def map_image(self):
-        if not self._map_image:
-            self._map_image = pygame.transform.scale(pygame.image.load(self.image_path + 'map.png'), (1920, 1080))
-        return self._map_image
+        return self.map_surface.get()
+
+    def reload_images(self):
+        if self._mini_game is not None:
+            self._mini_game.reload_images()
 
     @property
     def map_button_area(self):
@@ -71,9 +113,19 @@ class Location:
             self._map_button_area = self.get_button_area()
         return self._map_button_area
 
+    @property
+    def map_area(self):
+        """
+        Part of the (1920x1080) map covered by this location's map image
+        """
+        if not self._map_area:
+            x1, y1, x2, y2 = self.game.asset_index.bbox(self.image_path + 'map.png', scale_to=(1920, 1080))
+            # One pixel extra all round, to allow for rounding when scaling
+            self._map_area = pygame.Rect(x1 - 1, y1 - 1, x2 - x1 + 2, y2 - y1 + 2).clip(0, 0, 1920, 1080)
+        return self._map_area
+
     def get_button_area(self):
-        map_image = Image.open(self.image_path + 'map.png').resize((1920, 1080))
-        bbox = map_image.getbbox()
+        bbox = self.game.asset_index.bbox(self.image_path + 'map.png', scale_to=(1920, 1080))
         margin = 10
         x, y, width, height = bbox[0] + margin, \
                               bbox[1] + margin, \
@@ -81,54 +133,116 @@ class Location:
                               bbox[3] - bbox[1] - margin * 2
         return pygame.Rect(x, y, width, height)
 
-    def map_button_size(self):
-        return self.map_button_area[2] * self.map_button_area[3]
+    def unlock(self):
+        if self.unlocked:
+            return
+        self.unlocked = True
+        self.game.world_map.invalidate(self)
+        self.preload()
+
+    @property
+    def next_locations(self):
+        return self.game.locations.next_locations(self.id)
+
+    def pinned_surfaces(self):
+        return [self.background, self.intro_text_image]
 
-    def mouse_in_area(self, mouse_position):
-        return self.map_button_area.collidepoint(*mouse_position)
+    def prefetch_images(self):
+        self.background.prefetch()
+        if self.show_intro_text:
+            self.intro_text_image.prefetch()
+
+    @property
+    def mini_game_area(self):
+        return pygame.Rect(self.settings['game_location'], self.settings['game_size'])
+
+    def screen_rect(self):
+        """
+        Window area of the mini-game - shared by drawing and mouse positions
+        """
+        if self._screen_rect_size != self.game.size:
+            x_scale = self.game.size[0] / 1920
+            y_scale = self.game.size[1] / 1080
+            area = self.mini_game_area
+            left, top = round(area.left * x_scale), round(area.top * y_scale)
+            right, bottom = round(area.right * x_scale), round(area.bottom * y_scale)
+            self._screen_rect = pygame.Rect(left, top, right - left, bottom - top)
+            self._screen_rect_size = self.game.size
+        return self._screen_rect
+
+    def renders_direct(self):
+        """
+        Whether the mini-game draws straight into the window, at its real size, instead of into the frame
+        """
+        return self.game.direct_rendering and self.mini_game is not None and self.mini_game.direct_rendering
+
+    def invalidate_changes(self):
+        if self.mini_game and self.mini_game.dirty and not self.renders_direct():
+            self.game.compositor.invalidate(self.mini_game_area)
+
+    def update(self):
+        if self.mini_game:
+            self.mini_game.update()
 
-    def set_next_locations(self):
-        self.next_locations = [
-            self.game.location_for_id(id)
-            for id in self.game.settings['location_tree'].get(self.id, [])
-        ]
+    def frame_rate(self):
+        if self.mini_game:
+            return self.mini_game.frame_rate
+        return None
 
     def handle_key_event(self, key):
         if self.mini_game:
             self.mini_game.handle_key_event(key)
+            self.mini_game.dirty = True
 
     def handle_mouse_event(self, event):
         if self.mini_game:
             self.mini_game.handle_mouse_event(event)
+            self.mini_game.dirty = True
 
     def mini_game_mouse_pos(self):
         if not self.mini_game:
             return None
 
-        x, y = pygame.mouse.get_pos()
-
-        # scale to the window size
-        x = x / self.game.size[0] * 1920
-        y = y / self.game.size[1] * 1080
+        x, y = self.game.mouse_position
+        rect = self.screen_rect()
 
-        # make relative to top left hand corner of game area
-        x -= self.settings['game_location'][0]
-        y -= self.settings['game_location'][1]
-
-        # Scale size
-        x = int(x / self.settings['game_size'][0] * 900)
-        y = int(y / self.settings['game_size'][1] * 900)
+        # make relative to top left hand corner of game area, and scale to the 900x900 game
+        x = int((x - rect.left) / rect.width * 900)
+        y = int((y - rect.top) / rect.height * 900)
         return x, y
 
-    def draw(self):
-        result = self.background.copy()
+    def draw(self, frame):
+        frame.blit(self.background.get(), (0, 0))
 
         if self.show_intro_text:
-            result.blit(self.intro_text_image, (0, 0))
-
-        if self.mini_game:
-            game_image = self.mini_game.draw()
-            game_image = pygame.transform.scale(game_image, self.settings['game_size'])
-            result.blit(game_image, self.settings['game_location'])
-
-        return result
+            frame.blit(self.intro_text_image.get(), (0, 0))
+
+        if self.mini_game and not self.renders_direct():
+            if self.mini_game.dirty:
+                self.mini_game.dirty = False
+                self.mini_game_version += 1
+            with self.game.profiler.phase('mini_game'):
+                game_image = self.game.scaled_cache.get(
+                    self, self.mini_game_version, self.settings['game_size'], self.mini_game.draw
+                )
+            frame.blit(game_image, self.settings['game_location'])
+
+    def draw_direct(self, screen, updated_rects):
+        """
+        Let the mini-game draw into its area of the window
+        updated_rects: window areas just copied from the frame, which may have covered the mini-game
+        Returns the window area drawn, or None if nothing changed
+        """
+        rect = self.screen_rect()
+        key = id(screen), tuple(rect)
+        if self._direct_canvas_key != key:
+            self.mini_game.set_canvas(screen.subsurface(rect))
+            self._direct_canvas_key = key
+        elif rect.collidelist(updated_rects) != -1:
+            self.mini_game.redraw_all()
+
+        if not self.mini_game.dirty:
+            return None
+        self.mini_game.dirty = False
+        self.mini_game.draw()
+        return rect
@@ -0,0 +1,72 @@
+import collections
+
+
+class LocationGraphError(ValueError):
+    pass
+
+
+class LocationGraph:
+    """
+    All locations, indexed by id, with the locations each one unlocks
+    Checked when loaded: every id in the location tree must have a folder and be reachable from the initial location
+    Iterating over the graph gives the locations in id order
+    """
+    def __init__(self, locations, location_tree, initial_location_id):
+        self.locations = {location.id: location for location in sorted(locations, key=lambda location: location.id)}
+        self.initial_location_id = initial_location_id
+        self.next_ids = {id: list(next_ids or []) for id, next_ids in location_tree.items()}
+        self.check_dangling_ids()
+        self.reachable_ids = self.find_reachable_ids()
+        self.check_unreachable_ids()
+        self.next = {
+            id: [self.locations[next_id] for next_id in self.next_ids.get(id, [])]
+            for id in self.locations
+        }
+
+    def tree_ids(self):
+        result = set(self.next_ids)
+        for next_ids in self.next_ids.values():
+            result.update(next_ids)
+        return result
+
+    def check_dangling_ids(self):
+        if self.initial_location_id not in self.locations:
+            raise LocationGraphError(f'No folder for initial location {self.initial_location_id}')
+        dangling_ids = self.tree_ids() - set(self.locations)
+        if dangling_ids:
+            raise LocationGraphError(f'No folder for location ids in location_tree: {sorted(dangling_ids)}')
+
+    def find_reachable_ids(self):
+        result = {self.initial_location_id}
+        queue = collections.deque([self.initial_location_id])
+        while queue:
+            id = queue.popleft()
+            for next_id in self.next_ids.get(id, []):
+                if next_id not in result:
+                    result.add(next_id)
+                    queue.append(next_id)
+        return result
+
+    def check_unreachable_ids(self):
+        unreachable_ids = self.tree_ids() - self.reachable_ids
+        if unreachable_ids:
+            raise LocationGraphError(
+                f'Location ids in location_tree cannot be reached from {self.initial_location_id}: '
+                f'{sorted(unreachable_ids)}'
+            )
+
+    def __iter__(self):
+        return iter(self.locations.values())
+
+    def __len__(self):
+        return len(self.locations)
+
+    def get(self, id):
+        return self.locations.get(id)
+
+    def next_locations(self, id):
+        return self.next[id]
+
+    def unlock_next(self, id):
+        for location in self.next[id]:
+            location.unlock()
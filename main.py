@@ -1,27 +1,17 @@
-import yaml
-import flatten_dict
-
 from game_class import Game
+from settings_cache_class import SettingsCache
 
 
-def load_settings():
-    with open('settings.yml') as input_file:
-        settings = yaml.load(input_file, Loader=yaml.Loader)
-
-    try:
-        with open('local_settings.yml') as input_file:
-            local_settings = yaml.load(input_file, Loader=yaml.Loader)
-    except FileNotFoundError:
-        local_settings = {}
-
-    if local_settings:
-        settings = flatten_dict.flatten(settings)
-        local_settings = flatten_dict.flatten(local_settings)
-        settings.update(local_settings)
-        settings = flatten_dict.unflatten(settings)
-    return settings
+def load_settings(settings_cache=None):
+    """
+    settings.yml, with local_settings.yml on top - from the compiled settings cache
+    """
+    if settings_cache is None:
+        settings_cache = SettingsCache()
+    return settings_cache.settings
 
 
-settings = load_settings()
-game = Game(settings)
-game.run()
+if __name__ == '__main__':
+    settings_cache = SettingsCache()
+    game = Game(load_settings(settings_cache), settings_cache)
+    game.run()
@@ -0,0 +1,123 @@
+import array
+import hashlib
+import json
+import sys
+import zlib
+
+from PIL import Image, ImageDraw
+
+LABELS_FILENAME = 'map_labels.bin'
+
+
+class MapLabels:
+    """
+    Location id for every pixel of the (1920x1080) map, at 1/scale resolution - 0 for no location
+    Built from the outlines in the map.png images, with the inside of each room filled in;
+    smaller rooms are drawn last so rooms within rooms win
+    """
+    def __init__(self, asset_index, map_filenames, scale=4, filename=LABELS_FILENAME):
+        """
+        map_filenames: {location id: map image file name}
+        """
+        self.asset_index = asset_index
+        self.map_filenames = map_filenames
+        self.scale = scale
+        self.filename = filename
+        self.width = 1920 // scale
+        self.height = 1080 // scale
+        self.labels = None
+        self.future = None
+
+    def source_key(self):
+        hashes = sorted(
+            (id, self.asset_index.entry(filename)['hash'])
+            for id, filename in self.map_filenames.items()
+        )
+        return hashlib.sha1(json.dumps([self.scale, hashes]).encode()).hexdigest()
+
+    def load(self, key):
+        try:
+            with open(self.filename, 'rb') as input_file:
+                header = json.loads(input_file.readline())
+                data = input_file.read()
+        except (FileNotFoundError, ValueError):
+            return None
+        if header.get('key') != key:
+            return None
+
+        labels = array.array('H', zlib.decompress(data))
+        if sys.byteorder == 'big':
+            labels.byteswap()
+        return labels
+
+    def save(self, key, labels):
+        labels = array.array('H', labels)
+        if sys.byteorder == 'big':
+            labels.byteswap()
+        with open(self.filename, 'wb') as output_file:
+            output_file.write(json.dumps(dict(key=key, size=[self.width, self.height])).encode() + b'\n')
+            output_file.write(zlib.compress(labels.tobytes(), 9))
+
+    def room_mask(self, filename):
+        """
+        Mask (255 = inside the room) for one map image, at label resolution
+        Returns the mask and its top left position
+        """
+        alpha = Image.open(filename).getchannel('A').resize((self.width, self.height), Image.BOX)
+        walls = alpha.point(lambda value: 255 if value else 0)
+        bbox = walls.getbbox()
+        if bbox is None:
+            return None, None
+
+        # Crop with a one pixel border, so the outside is connected all the way round
+        x1, y1, x2, y2 = bbox
+        mask = walls.crop((x1 - 1, y1 - 1, x2 + 1, y2 + 1))
+        ImageDraw.floodfill(mask, (0, 0), 128)
+        mask = mask.point(lambda value: 0 if value == 128 else 255)
+
+        # Gap in the walls: the fill got inside, so use the bounding box instead
+        room_area = mask.histogram()[255]
+        if room_area < (x2 - x1) * (y2 - y1) // 2:
+            mask = Image.new('L', mask.size, 0)
+            mask.paste(255, (1, 1, mask.width - 1, mask.height - 1))
+
+        return mask, (x1 - 1, y1 - 1)
+
+    def build(self):
+        rooms = []
+        for id, filename in self.map_filenames.items():
+            mask, position = self.room_mask(filename)
+            if mask is not None:
+                rooms.append((mask.histogram()[255], id, mask, position))
+
+        labels = Image.new('I', (self.width, self.height), 0)
+        for _, id, mask, position in sorted(rooms, reverse=True):
+            labels.paste(id, position + (position[0] + mask.width, position[1] + mask.height), mask)
+
+        return array.array('H', labels.getdata())
+
+    def prepare(self):
+        key = self.source_key()
+        self.labels = self.load(key)
+        if self.labels is None:
+            self.labels = self.build()
+            self.save(key, self.labels)
+
+    def prefetch(self, executor):
+        """
+        Hashing the map images, and building the labels if they changed, takes a while - do it in the background
+        """
+        if self.labels is None and self.future is None:
+            self.future = executor.submit(self.prepare)
+
+    def location_id_at(self, position):
+        if self.labels is None:
+            if self.future is None:
+                self.prepare()
+            else:
+                self.future.result()
+        x = int(position[0]) // self.scale
+        y = int(position[1]) // self.scale
+        if x < 0 or y < 0 or x >= self.width or y >= self.height:
+            return None
+        return self.labels[y * self.width + x] or None
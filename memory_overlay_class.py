@@ -0,0 +1,39 @@
+import pygame
+
+
+class MemoryOverlay:
+    """
+    Memory used by images, drawn over the frame - F4 toggles it
+    """
+    line_height = 28
+    # Largest surfaces listed, to keep the overlay a fixed size
+    max_lines = 20
+
+    def __init__(self):
+        self.show = False
+        self.area = pygame.Rect(400, 10, 1100, self.line_height * self.max_lines + 20)
+        self.font = None
+        self.lines = []
+
+    def toggle(self):
+        self.show = not self.show
+
+    def update(self, lines):
+        """
+        Returns whether the report changed, so the overlay needs drawing again
+        """
+        lines = lines[:self.max_lines]
+        if lines == self.lines:
+            return False
+        self.lines = lines
+        return True
+
+    def draw(self, frame):
+        if self.font is None:
+            self.font = pygame.font.SysFont('Courier New', 24, bold=True)
+
+        frame.fill('Black', self.area)
+        x, y = self.area.left + 10, self.area.top + 10
+        for line in self.lines:
+            frame.blit(self.font.render(line, True, 'White'), (x, y))
+            y += self.line_height
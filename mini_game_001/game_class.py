@@ -4,13 +4,15 @@ from mini_game_class import MiniGame
 
 
 class Game(MiniGame):
+    direct_rendering = True
+
     def __init__(self, location):
         super().__init__(location)
-        self.canvas.fill('Blue')
         self.button = pygame.Rect(100, 100, 150, 200)
-        pygame.draw.rect(self.canvas, 'Green', self.button)
 
     def draw(self):
+        self.canvas.fill('Blue')
+        pygame.draw.rect(self.canvas, 'Red' if self.done else 'Green', self.to_canvas(self.button))
         return self.canvas
 
     def handle_mouse_event(self, mouse_event):
@@ -22,5 +24,4 @@ class Game(MiniGame):
                 return
 
             # Clicked the button
-            pygame.draw.rect(self.canvas, 'Red', self.button)
             self.game_completion()
@@ -1,44 +1,41 @@
+import array
 import pygame
-import random
 
 from mini_game_class import MiniGame
-
-
-class Button:
-    def __init__(self, click_area, row, column):
-        self.click_area = click_area
-        self.row = row
-        self.column = column
-
-    def was_clicked(self, mouse_position):
-        return self.click_area.collidepoint(*mouse_position)
+from .solver import EMPTY, Solver
 
 
 class Game(MiniGame):
+    """
+    Sliding puzzle
+    The board is a flat array of tile numbers, row by row, with EMPTY for the hole;
+    tile n belongs at index n
+    Starts scrambled so that the shortest solution takes exactly settings['difficulty'] moves
+    """
+    direct_rendering = True
+
     def __init__(self, location):
         super().__init__(location)
         self.size = self.settings['size']
         self.tile_size = 900 // self.size
         self.tiles = self.load_tiles()
-        self.grid = self.create_grid()
-        self.shuffle_tiles(5)
-        self.buttons = None
-
-    def create_grid(self):
-        grid = []
-        coordinates = []
-        for row in range(self.size):
-            grid.append([])
-            for column in range(self.size):
-                grid[row].append(row * self.size + column)
-                coordinates.append((row, column))
-
-        grid[1][1] = None
-
-        return grid
+        # Tiles scaled to the canvas, by (tile number, size)
+        self.scaled_tiles = {}
+        self.solver = Solver.for_size(self.size)
+        self.neighbours = self.solver.neighbours
+        if location.saved_mini_game_state is not None:
+            # About to be replaced by the saved board - no need to search for a scramble
+            self.board = array.array('i', self.solver.goal)
+        else:
+            self.board = array.array('i', self.solver.scramble(self.settings.get('difficulty', 5)))
+        self.empty_index = self.board.index(EMPTY)
+        self.misplaced_count = self.count_misplaced()
+        # Cells to redraw - None to redraw the whole canvas
+        self.changed_cells = None
+        self.update_hit_areas()
 
     def load_tiles(self):
-        image = pygame.image.load(f'{self.location.image_path}puzzle.png')
+        image = self.location.game.assets.load(f'{self.location.image_path}puzzle.png')
         result = []
         for row in range(self.size):
             for column in range(self.size):
@@ -49,77 +46,120 @@ class Game(MiniGame):
 
         return result
 
-    def get_empty_cell(self):
-        for row in range(self.size):
-            for column in range(self.size):
-                if self.grid[row][column] is None:
-                    return row, column
-
-    def create_buttons(self):
-        buttons = []
-        row, column = self.get_empty_cell()
-        for row_offset, column_offset in [(1, 0), (-1, 0), (0, 1), (0, -1)]:
-            r = row + row_offset
-            c = column + column_offset
-            if r < 0 or c < 0 or r >= self.size or c >= self.size:
-                continue
-            buttons.append(Button(
-                pygame.Rect(c * self.tile_size, r * self.tile_size, self.tile_size, self.tile_size),
-                r,
-                c
-            ))
-        return buttons
+    def count_misplaced(self):
+        return sum(
+            1 for index, tile_number in enumerate(self.board)
+            if tile_number not in (EMPTY, index)
+        )
+
+    def save_state(self):
+        state = super().save_state()
+        state.update(board=list(self.board), empty_index=self.empty_index)
+        return state
+
+    def load_state(self, state):
+        board = array.array('i', state['board'])
+        empty_index = state['empty_index']
+        if not 0 <= empty_index < len(board):
+            raise ValueError('Saved hole is off the board')
+        if state['done']:
+            # Finished boards have the last tile in the hole
+            tiles, hole = list(range(self.solver.cells)), empty_index
+        else:
+            tiles, hole = sorted(self.solver.goal), EMPTY
+        if sorted(board) != tiles or board[empty_index] != hole:
+            raise ValueError('Saved board does not fit this puzzle')
+        self.board = board
+        self.empty_index = empty_index
+        self.misplaced_count = self.count_misplaced()
+        super().load_state(state)
+        self.update_hit_areas()
+
+    def reload_images(self):
+        self.tiles = self.load_tiles()
+        self.scaled_tiles = {}
+        super().reload_images()
+
+    def cell_rect(self, index):
+        row, column = divmod(index, self.size)
+        return pygame.Rect(column * self.tile_size, row * self.tile_size, self.tile_size, self.tile_size)
+
+    def update_hit_areas(self):
+        """
+        Only the tiles next to the hole can be clicked
+        """
+        self.hit_areas.clear()
+        if self.done:
+            return
+        for index in self.neighbours[self.empty_index]:
+            self.hit_areas.add(index, self.cell_rect(index), index)
+
+    def tile_image(self, tile_number, size):
+        tile = self.tiles[tile_number]
+        if tile.get_size() == size:
+            return tile
+        key = tile_number, size
+        if key not in self.scaled_tiles:
+            self.scaled_tiles[key] = pygame.transform.smoothscale(tile, size)
+        return self.scaled_tiles[key]
+
+    def draw_cell(self, index):
+        rect = self.to_canvas(self.cell_rect(index))
+        self.canvas.fill('Black', rect)
+        tile_number = self.board[index]
+        if tile_number != EMPTY:
+            self.canvas.blit(self.tile_image(tile_number, rect.size), rect)
+
+    def redraw_all(self):
+        super().redraw_all()
+        self.changed_cells = None
 
     def draw(self):
-        self.canvas.fill('Black')
-        for row in range(self.size):
-            for column in range(self.size):
-                tile_number = self.grid[row][column]
-                if tile_number is None:
-                    continue
-                tile = self.tiles[tile_number]
-                self.canvas.blit(tile, (column * self.tile_size, row * self.tile_size))
-        if not self.done:
-            self.buttons = self.create_buttons()
+        if self.changed_cells is None:
+            self.canvas.fill('Black')
+            for index in range(len(self.board)):
+                self.draw_cell(index)
+        else:
+            for index in self.changed_cells:
+                self.draw_cell(index)
+        self.changed_cells = set()
 
         return self.canvas
 
-    def swap_tiles(self, row, column):
-        empty_row, empty_column = self.get_empty_cell()
-        self.grid[empty_row][empty_column] = self.grid[row][column]
-        self.grid[row][column] = None
+    def swap_tiles(self, index):
+        """
+        Move the tile at index into the hole
+        """
+        tile_number = self.board[index]
+        self.misplaced_count += (tile_number != self.empty_index) - (tile_number != index)
+        self.board[self.empty_index] = tile_number
+        self.board[index] = EMPTY
+        if self.changed_cells is not None:
+            self.changed_cells.update([index, self.empty_index])
+        self.empty_index = index
 
     def check_completion(self):
-        for row in range(self.size):
-            for column in range(self.size):
-                cell = self.grid[row][column]
-                if cell is not None and cell != row * self.size + column:
-                    return
+        if self.misplaced_count:
+            return
 
-        empty_row, empty_column = self.get_empty_cell()
-        self.grid[empty_row][empty_column] = empty_row * self.size + empty_column
+        self.board[self.empty_index] = self.empty_index
+        if self.changed_cells is not None:
+            self.changed_cells.add(self.empty_index)
         self.game_completion()
 
     def handle_mouse_event(self, mouse_event):
         if mouse_event.type == pygame.MOUSEBUTTONUP:
-            mouse_position = self.location.mini_game_mouse_pos()
-            for button in self.buttons:
-                if button.was_clicked(mouse_position):
-                    self.swap_tiles(button.row, button.column)
-                    self.check_completion()
-                    return
-
-    def swap_random(self):
-        empty_row, empty_column = self.get_empty_cell()
-        while True:
-            row_offset, column_offset= random.choice([(1, 0), (-1, 0), (0, 1), (0, -1)])
-            r = empty_row + row_offset
-            c = empty_column + column_offset
-            if r < 0 or c < 0 or r >= self.size or c >= self.size:
-                continue
-            self.swap_tiles(r, c)
-            break
-
-    def shuffle_tiles(self, times):
-        for _ in range(times):
-            self.swap_random()
+            index = self.clicked_area()
+            if index is None:
+                return
+            self.swap_tiles(index)
+            self.check_completion()
+            self.update_hit_areas()
+
+    def hint(self):
+        """
+        Index of the tile to move next on the shortest route to the solution
+        """
+        if self.done:
+            return None
+        return self.solver.hint(self.board)
@@ -0,0 +1,309 @@
+"""
+Optimal solver and scrambler for the sliding puzzle
+
+Boards are sequences of tile numbers, row by row, with EMPTY for the hole.
+Tile n belongs at index n, the hole at index size + 1.
+
+The heuristic is an additive pattern database: the tiles are split into groups,
+and for every placement of a group's tiles the database holds the number of
+moves of those tiles needed to get them home. Boards too big for useful
+databases get groups of one tile, which is the Manhattan distance - as do sizes
+whose databases were not built.
+
+Build the databases ahead of time with: python -m mini_game_002.solver 3 4
+"""
+import collections
+import json
+import logging
+import math
+import os
+import random
+import sys
+import zlib
+
+EMPTY = -1
+DATABASE_PATH = 'mini_game_002/pattern_databases/'
+# Limits on the size of a single table and on the total states searched when building
+MAX_TABLE_SIZE = 2 ** 24
+MAX_STATES = 3000000
+
+FOUND = -1
+
+logger = logging.getLogger(__name__)
+
+
+def group_size(size):
+    cells = size * size
+    tiles = cells - 1
+    for k in range(tiles, 1, -1):
+        if cells ** (k + 1) > MAX_TABLE_SIZE:
+            continue
+        if math.ceil(tiles / k) * math.perm(cells, k + 1) <= MAX_STATES:
+            return k
+    return 1
+
+
+class PatternDatabase:
+    """
+    Moves needed to get one group of tiles home, for every placement of those tiles
+    Indexed by sum(position of group tile i * cells ** i)
+    """
+    def __init__(self, size, tiles, table=None):
+        self.size = size
+        self.cells = size * size
+        self.tiles = tiles
+        self.powers = [self.cells ** i for i in range(len(tiles))]
+        self.table = table if table is not None else self.build()
+
+    def neighbours(self, index):
+        row, column = divmod(index, self.size)
+        return [
+            r * self.size + c
+            for r, c in [(row + 1, column), (row - 1, column), (row, column + 1), (row, column - 1)]
+            if 0 <= r < self.size and 0 <= c < self.size
+        ]
+
+    def build(self):
+        if len(self.tiles) == 1:
+            return self.build_manhattan()
+
+        cells = self.cells
+        k = len(self.tiles)
+        neighbours = [self.neighbours(index) for index in range(cells)]
+        table = bytearray([255]) * cells ** k
+
+        # 0-1 breadth first search over (group tile positions, hole position):
+        # moving one of the group's tiles costs 1, moving any other tile is free
+        distances = bytearray([255]) * cells ** (k + 1)
+        start = self.size + 1 + cells * sum(tile * power for tile, power in zip(self.tiles, self.powers))
+        distances[start] = 0
+        queue = collections.deque([start])
+        while queue:
+            state = queue.popleft()
+            distance = distances[state]
+            rest, hole = divmod(state, cells)
+            if distance < table[rest]:
+                table[rest] = distance
+
+            positions = []
+            value = rest
+            for _ in range(k):
+                value, position = divmod(value, cells)
+                positions.append(position)
+
+            for cell in neighbours[hole]:
+                if cell in positions:
+                    new_state = cell + cells * (rest + (hole - cell) * self.powers[positions.index(cell)])
+                    if distances[new_state] > distance + 1:
+                        distances[new_state] = distance + 1
+                        queue.append(new_state)
+                else:
+                    new_state = cell + cells * rest
+                    if distances[new_state] > distance:
+                        distances[new_state] = distance
+                        queue.appendleft(new_state)
+
+        return table
+
+    def build_manhattan(self):
+        goal_row, goal_column = divmod(self.tiles[0], self.size)
+        return bytearray(
+            abs(row - goal_row) + abs(column - goal_column)
+            for row in range(self.size)
+            for column in range(self.size)
+        )
+
+    def index(self, positions):
+        return sum(positions[tile] * power for tile, power in zip(self.tiles, self.powers))
+
+
+class Solver:
+    _solvers = {}
+
+    def __init__(self, size, databases=None):
+        self.size = size
+        self.cells = size * size
+        self.goal_hole = size + 1
+        self.goal = [EMPTY if index == self.goal_hole else index for index in range(self.cells)]
+        self.neighbours = [self.neighbour_cells(index) for index in range(self.cells)]
+        self.databases = databases if databases is not None else self.load()
+        # For each tile: (database number, power of its position in that database's index)
+        self.tile_groups = {}
+        for number, database in enumerate(self.databases):
+            for tile, power in zip(database.tiles, database.powers):
+                self.tile_groups[tile] = (number, power)
+
+    @classmethod
+    def for_size(cls, size):
+        if size not in cls._solvers:
+            cls._solvers[size] = cls(size)
+        return cls._solvers[size]
+
+    def neighbour_cells(self, index):
+        row, column = divmod(index, self.size)
+        return [
+            r * self.size + c
+            for r, c in [(row + 1, column), (row - 1, column), (row, column + 1), (row, column - 1)]
+            if 0 <= r < self.size and 0 <= c < self.size
+        ]
+
+    def groups(self):
+        tiles = [tile for tile in range(self.cells) if tile != self.goal_hole]
+        k = group_size(self.size)
+        return [tiles[start:start + k] for start in range(0, len(tiles), k)]
+
+    @property
+    def filename(self):
+        return f'{DATABASE_PATH}{self.size}x{self.size}.bin'
+
+    def load(self):
+        """
+        The pattern databases - from the file built by this module's command line, as building them takes seconds
+        """
+        groups = self.groups()
+        if len(groups[0]) == 1:
+            return self.manhattan_databases()
+
+        try:
+            with open(self.filename, 'rb') as input_file:
+                header = json.loads(input_file.readline())
+                data = zlib.decompress(input_file.read())
+        except FileNotFoundError:
+            logger.warning(
+                'No pattern databases for %sx%s, using Manhattan distance - '
+                'build them with: python -m mini_game_002.solver %s', self.size, self.size, self.size
+            )
+            return self.manhattan_databases()
+        if header.get('groups') != groups:
+            logger.warning(
+                '%s is out of date, using Manhattan distance - '
+                'build it again with: python -m mini_game_002.solver %s', self.filename, self.size
+            )
+            return self.manhattan_databases()
+
+        databases = []
+        offset = 0
+        for group in groups:
+            length = self.cells ** len(group)
+            databases.append(PatternDatabase(self.size, group, bytearray(data[offset:offset + length])))
+            offset += length
+        return databases
+
+    def manhattan_databases(self):
+        """
+        Groups of one tile - slower to solve with, but need no file
+        """
+        return [PatternDatabase(self.size, [tile]) for tile in range(self.cells) if tile != self.goal_hole]
+
+    @classmethod
+    def build(cls, size):
+        """
+        Build the pattern databases for size and save them, for load()
+        """
+        solver = cls(size, databases=[])
+        databases = [PatternDatabase(size, group) for group in solver.groups()]
+        if len(databases[0].tiles) > 1:
+            os.makedirs(DATABASE_PATH, exist_ok=True)
+            with open(solver.filename, 'wb') as output_file:
+                output_file.write(json.dumps(dict(groups=solver.groups())).encode() + b'\n')
+                output_file.write(zlib.compress(b''.join(database.table for database in databases), 9))
+        return cls(size, databases)
+
+    def solve(self, board):
+        """
+        Shortest solution: list of board indexes of the tiles to slide into the hole, in order
+        """
+        board = list(board)
+        positions = [0] * self.cells
+        for index, tile in enumerate(board):
+            if tile != EMPTY:
+                positions[tile] = index
+        hole = board.index(EMPTY)
+        indexes = [database.index(positions) for database in self.databases]
+        tables = [database.table for database in self.databases]
+        estimate = sum(table[index] for table, index in zip(tables, indexes))
+        path = []
+
+        def search(hole, cost, estimate, bound, previous_hole):
+            total = cost + estimate
+            if total > bound:
+                return total
+            if estimate == 0:
+                return FOUND
+
+            minimum = math.inf
+            for cell in self.neighbours[hole]:
+                if cell == previous_hole:
+                    continue
+                tile = board[cell]
+                number, power = self.tile_groups[tile]
+                old_index = indexes[number]
+                new_index = old_index + (hole - cell) * power
+                new_estimate = estimate - tables[number][old_index] + tables[number][new_index]
+
+                board[hole], board[cell] = tile, EMPTY
+                indexes[number] = new_index
+                path.append(cell)
+                result = search(cell, cost + 1, new_estimate, bound, hole)
+                if result == FOUND:
+                    return FOUND
+                path.pop()
+                indexes[number] = old_index
+                board[hole], board[cell] = EMPTY, tile
+                minimum = min(minimum, result)
+            return minimum
+
+        bound = estimate
+        while True:
+            result = search(hole, 0, estimate, bound, None)
+            if result == FOUND:
+                return path
+            if result == math.inf:
+                return None
+            bound = result
+
+    def distance(self, board):
+        return len(self.solve(board))
+
+    def hint(self, board):
+        """
+        Index of the tile to move next, or None when solved
+        """
+        solution = self.solve(board)
+        return solution[0] if solution else None
+
+    def scramble(self, distance, rng=random, attempts=100):
+        """
+        Board whose shortest solution takes exactly distance moves
+        Random walks away from the goal, extended until the optimal distance reaches the target
+        (or the closest board found, when the target is beyond what this size allows)
+        """
+        best = list(self.goal)
+        best_distance = 0
+        board = list(self.goal)
+        hole = self.goal_hole
+        previous_hole = None
+        steps = distance
+        for _ in range(attempts):
+            for _ in range(steps):
+                cell = rng.choice([cell for cell in self.neighbours[hole] if cell != previous_hole])
+                board[hole], board[cell] = board[cell], EMPTY
+                previous_hole, hole = hole, cell
+
+            board_distance = self.distance(board)
+            if board_distance == distance:
+                return board
+            if board_distance > best_distance:
+                best, best_distance = list(board), board_distance
+            # Same parity as the target, so the walk can land on it exactly
+            steps = max(distance - board_distance, 2)
+            if board_distance > distance:
+                board, hole, previous_hole, steps = list(self.goal), self.goal_hole, None, distance
+        return best
+
+
+if __name__ == '__main__':
+    for size in sys.argv[1:] or ['3', '4']:
+        solver = Solver.build(int(size))
+        print(f'{size}x{size}: {len(solver.databases)} pattern databases of up to '
+              f'{len(solver.databases[0].tiles)} tiles')
@@ -3,9 +3,40 @@ import collections
 import pygame
 
 from mini_game_class import MiniGame
+from .solver import Puzzle, grid_from_settings
 
 # TODO: Show the target area (green? - see text for location 22)
 
+# Shared by all games: decoded images by file name, and their rotated and scaled variants
+decoded_images = {}
+image_variants = {}
+# Canvas scale the variants were made for
+variants_scale = None
+
+
+def tile_image(assets, filename, rotate, size):
+    key = filename, rotate, size
+    if key not in image_variants:
+        if filename not in decoded_images:
+            decoded_images[filename] = assets.load(filename)
+        image = decoded_images[filename]
+        if rotate:
+            image = pygame.transform.rotate(image, 90)
+        if image.get_size() != size:
+            image = pygame.transform.smoothscale(image, size)
+        image_variants[key] = image
+    return image_variants[key]
+
+
+def use_canvas_scale(canvas_scale):
+    """
+    Drop the variants scaled for another canvas size, so they do not pile up as the window gets resized
+    """
+    global variants_scale
+    if canvas_scale != variants_scale:
+        variants_scale = canvas_scale
+        image_variants.clear()
+
 
 class Button:
     """
@@ -18,34 +49,25 @@ class Button:
         self.tile_name = tile_name
         self.click_area = pygame.Rect(click_area)
         self.new_tile_position = new_tile_position
-        self.clicked = False
-
-    def was_clicked(self, mouse_position):
-        if self.clicked:
-            return False
-        return self.click_area.collidepoint(*mouse_position)
 
     def execute(self):
-        grid = self.game.grid
-        for y, row in enumerate(grid):
-            for x, cell in enumerate(row):
-                if cell == self.tile_name:
-                    grid[y][x] = ''
-        for x, y in self.new_tile_position:
-            grid[y][x] = self.tile_name
-        self.clicked = True
+        self.game.move_tile(self.tile_name, self.new_tile_position)
 
 
 class Game(MiniGame):
+    direct_rendering = True
+
     def __init__(self, location):
         super().__init__(location)
-        self.grid = self.grid_from_settings(self.settings['grid_start'])
+        self.grid = grid_from_settings(self.settings['grid_start'])
         self.row_count = len(self.grid)
         self.column_count = len(self.grid[0])
         self.cell_width = 900 // self.column_count
         self.cell_height = 900 // self.row_count
+        self.block_positions = self.get_block_positions()
         self.images = self.load_images()
-        self.buttons = self.create_buttons()
+        self.tile_buttons = {}
+        self.reset_buttons()
         # TODO, maybe: add a background image
 
     def can_move_to(self, name, positions):
@@ -124,28 +146,95 @@ class Game(MiniGame):
             return []
 
         result = []
+        for buttons in self.tile_buttons.values():
+            result += buttons
+        return result
 
-        block_positions = self.get_block_positions()
-        for name, position in block_positions.items():
-            result += self.get_buttons_for_tile(name, position)
+    def reset_buttons(self):
+        self.hit_areas.clear()
+        self.tile_buttons = {}
+        if not self.done:
+            for name, positions in self.block_positions.items():
+                self.set_tile_buttons(name, self.get_buttons_for_tile(name, positions))
+        self.buttons = self.create_buttons()
 
-        return result
+    def save_state(self):
+        state = super().save_state()
+        state.update(grid=[list(row) for row in self.grid])
+        return state
+
+    def load_state(self, state):
+        grid = [list(row) for row in state['grid']]
+        if len(grid) != self.row_count or any(len(row) != self.column_count for row in grid):
+            raise ValueError('Saved grid does not fit this level')
+        self.grid = grid
+        self.block_positions = self.get_block_positions()
+        if set(self.block_positions) != set(self.images):
+            raise ValueError('Saved grid does not fit this level')
+        super().load_state(state)
+        self.reset_buttons()
+
+    def set_tile_buttons(self, name, buttons):
+        """
+        Replace a tile's buttons, in the hit areas too
+        """
+        for button in self.tile_buttons.get(name, []):
+            self.hit_areas.remove(button)
+        self.tile_buttons[name] = buttons
+        for button in buttons:
+            self.hit_areas.add(button, button.click_area, button)
+
+    def move_tile(self, name, new_positions):
+        """
+        Move a tile, and update the buttons of the tiles around the cells that changed
+        """
+        old_positions = self.block_positions[name]
+        for x, y in old_positions:
+            self.grid[y][x] = ''
+        for x, y in new_positions:
+            self.grid[y][x] = name
+        self.block_positions[name] = new_positions
+
+        changed_cells = set(old_positions) ^ set(new_positions)
+        names = {name}
+        for x, y in changed_cells:
+            for nx, ny in [(x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)]:
+                if 0 <= nx < self.column_count and 0 <= ny < self.row_count and self.grid[ny][nx]:
+                    names.add(self.grid[ny][nx])
+        for name in names:
+            self.set_tile_buttons(name, self.get_buttons_for_tile(name, self.block_positions[name]))
 
     def load_images(self):
-        # TODO: rotate images once loaded - see the board
-        return {
-            name: pygame.image.load(f'{self.image_path}{image_name}.png')
-            for name, image_name in self.settings['tile_images'].items()
-        }
-
-    @staticmethod
-    def grid_from_settings(raw_grid):
-        return [
-            [char.replace('.', '') for char in line.split()]
-            for line in raw_grid
-        ]
+        """
+        Each tile's image file, whether to turn it upright (for vertical tiles) and the size of the cells it covers
+        The images themselves come from tile_image(), which decodes, rotates and scales them once
+        """
+        result = {}
+        for name, positions in self.block_positions.items():
+            top_left = min(positions)
+            bottom_right = max(positions)
+            width = bottom_right[0] - top_left[0]
+            height = bottom_right[1] - top_left[1]
+            size = (width + 1) * self.cell_width, (height + 1) * self.cell_height
+            filename = f"{self.image_path}{self.settings['tile_images'][name]}.png"
+            result[name] = filename, height > width, size
+            tile_image(self.location.game.assets, *result[name])
+        return result
+
+    def set_canvas(self, canvas):
+        super().set_canvas(canvas)
+        use_canvas_scale(self.canvas_scale)
+
+    def reload_images(self):
+        # Shared with the other games, which load them again as they draw
+        decoded_images.clear()
+        image_variants.clear()
+        super().reload_images()
 
     def get_block_positions(self):
+        """
+        Scan the grid for the cells of each tile - only when starting, moves update the result
+        """
         block_positions = collections.defaultdict(list)
         for y, row in enumerate(self.grid):
             for x, cell in enumerate(row):
@@ -154,48 +243,44 @@ class Game(MiniGame):
                 block_positions[cell].append((x, y))
         return block_positions
 
+    def hint(self):
+        """
+        Next (tile name, direction) on a shortest route to the finish, or None
+        """
+        if self.done:
+            return None
+        return Puzzle(self.grid, self.settings['finish_position']).hint()
+
     def game_finished(self):
-        block_positions = self.get_block_positions()
-        return list(block_positions['x'][0]) == list(self.settings['finish_position'])
+        return list(self.block_positions['x'][0]) == list(self.settings['finish_position'])
 
     def draw(self):
         if self.done:
             self.canvas.fill('Blue')
         else:
             self.canvas.fill('White')
-        block_positions = self.get_block_positions()
 
-        for name, positions in block_positions.items():
+        for name, positions in self.block_positions.items():
             top_left = min(positions)
-            bottom_right = max(positions)
-            width = bottom_right[0] - top_left[0]
-            height = bottom_right[1] - top_left[1]
-            image = self.images[name]
-            if height > width:
-                image = image.copy()
-                image = pygame.transform.rotate(image, 90)
-
-            x = top_left[0] * self.cell_width
-            y = top_left[1] * self.cell_height
-            self.canvas.blit(image, (x, y))
+            filename, rotate, size = self.images[name]
+            rect = self.to_canvas((top_left[0] * self.cell_width, top_left[1] * self.cell_height) + size)
+            self.canvas.blit(tile_image(self.location.game.assets, filename, rotate, rect.size), rect)
 
         for button in self.buttons:
             # Todo: replace squares with arrows
-            pygame.draw.rect(self.canvas, 'Green', button.click_area)
+            pygame.draw.rect(self.canvas, 'Green', self.to_canvas(button.click_area))
 
         return self.canvas
 
     # TODO: Replace clicking squares with drag and drop
     def handle_mouse_event(self, mouse_event):
         if mouse_event.type == pygame.MOUSEBUTTONUP:
-            mouse_position = self.location.mini_game_mouse_pos()
-            if mouse_position is None:
+            button = self.clicked_area()
+            if button is None:
                 return
 
-            for button in self.buttons:
-                if button.was_clicked(mouse_position):
-                    button.execute()
-                    if self.game_finished():
-                        self.game_completion()
-                    self.buttons = self.create_buttons()
-                    return
+            button.execute()
+            if self.game_finished():
+                self.game_completion()
+                self.hit_areas.clear()
+            self.buttons = self.create_buttons()
@@ -0,0 +1,154 @@
+"""
+Breadth first solver for the sliding blocks puzzle
+
+A state is a single int: the top left cell number (y * width + x) of every block,
+packed together. Blocks are bit masks over the board, so checking a move is a
+shift and an AND.
+"""
+import collections
+
+DIRECTIONS = {
+    'left': (-1, 0),
+    'right': (1, 0),
+    'up': (0, -1),
+    'down': (0, 1)
+}
+
+
+class Puzzle:
+    def __init__(self, grid, finish_position, target='x'):
+        """
+        grid: rows of block names, '' for empty - as in mini_game_003.Game.grid
+        """
+        self.height = len(grid)
+        self.width = len(grid[0])
+        self.bits = (self.width * self.height).bit_length()
+        self.field = (1 << self.bits) - 1
+
+        cells = collections.defaultdict(list)
+        for y, row in enumerate(grid):
+            for x, name in enumerate(row):
+                if name:
+                    cells[name].append((x, y))
+        self.names = sorted(cells)
+        self.target = self.names.index(target)
+        self.finish = finish_position[1] * self.width + finish_position[0]
+
+        self.masks = []
+        self.sizes = []
+        self.directions = []
+        start_positions = []
+        for name in self.names:
+            left = min(x for x, y in cells[name])
+            top = min(y for x, y in cells[name])
+            width = max(x for x, y in cells[name]) - left
+            height = max(y for x, y in cells[name]) - top
+            mask = 0
+            for x, y in cells[name]:
+                mask |= 1 << ((y - top) * self.width + (x - left))
+            self.masks.append(mask)
+            self.sizes.append((width + 1, height + 1))
+            start_positions.append(top * self.width + left)
+            # Same rule as the game: squares move any way, other blocks along their longest side
+            if width == height:
+                self.directions.append(['left', 'right', 'up', 'down'])
+            elif width > height:
+                self.directions.append(['left', 'right'])
+            else:
+                self.directions.append(['up', 'down'])
+        self.start = self.encode(start_positions)
+
+    def encode(self, positions):
+        state = 0
+        for position in reversed(positions):
+            state = (state << self.bits) | position
+        return state
+
+    def decode(self, state):
+        positions = []
+        for _ in self.names:
+            positions.append(state & self.field)
+            state >>= self.bits
+        return positions
+
+    def moves(self, state):
+        """
+        (block name, direction, new state) for every single step move
+        """
+        positions = self.decode(state)
+        occupied = 0
+        for mask, position in zip(self.masks, positions):
+            occupied |= mask << position
+
+        for number, (mask, position) in enumerate(zip(self.masks, positions)):
+            others = occupied & ~(mask << position)
+            y, x = divmod(position, self.width)
+            width, height = self.sizes[number]
+            for direction in self.directions[number]:
+                dx, dy = DIRECTIONS[direction]
+                if not (0 <= x + dx and x + dx + width <= self.width and 0 <= y + dy and y + dy + height <= self.height):
+                    continue
+                new_position = position + dy * self.width + dx
+                if others & (mask << new_position):
+                    continue
+                shift = number * self.bits
+                new_state = state + ((new_position - position) << shift)
+                yield self.names[number], direction, new_state
+
+    def finished(self, state):
+        return (state >> (self.target * self.bits)) & self.field == self.finish
+
+    def solve(self, state=None, max_states=None):
+        """
+        Shortest list of (block name, direction) moves, or None if the puzzle cannot be solved
+        """
+        start = self.start if state is None else state
+        if self.finished(start):
+            return []
+
+        previous = {start: None}
+        queue = collections.deque([start])
+        while queue:
+            state = queue.popleft()
+            for name, direction, new_state in self.moves(state):
+                if new_state in previous:
+                    continue
+                previous[new_state] = (state, name, direction)
+                if self.finished(new_state):
+                    return self.path(previous, new_state)
+                queue.append(new_state)
+            if max_states is not None and len(previous) > max_states:
+                break
+        return None
+
+    @staticmethod
+    def path(previous, state):
+        result = []
+        while previous[state] is not None:
+            state, name, direction = previous[state]
+            result.append((name, direction))
+        return result[::-1]
+
+    def hint(self):
+        """
+        Next (block name, direction) on a shortest route, or None
+        """
+        solution = self.solve()
+        return solution[0] if solution else None
+
+
+def grid_from_settings(raw_grid):
+    return [
+        [char.replace('.', '') for char in line.split()]
+        for line in raw_grid
+    ]
+
+
+def validate(settings):
+    puzzle = Puzzle(grid_from_settings(settings['grid_start']), settings['finish_position'])
+    solution = puzzle.solve()
+    return dict(
+        solvable=solution is not None,
+        moves=None if solution is None else len(solution),
+        hint=None if not solution else list(solution[0])
+    )
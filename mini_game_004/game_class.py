@@ -1,17 +1,7 @@
 import pygame
-from PIL import Image
 
 from mini_game_class import MiniGame
-
-
-class Button:
-    def __init__(self, click_area, row, column):
-        self.click_area = click_area
-        self.row = row
-        self.column = column
-
-    def was_clicked(self, mouse_position):
-        return self.click_area.collidepoint(*mouse_position)
+from .solver import Puzzle, grid_from_settings
 
 
 class Game(MiniGame):
@@ -19,70 +9,103 @@ class Game(MiniGame):
         super().__init__(location)
         self.size = self.settings['size']
         self.image_path += f'{self.size}x{self.size}/'
-        self.background = pygame.image.load(self.image_path + 'background.png')
+        self.background = self.location.game.assets.load(self.image_path + 'background.png')
         self.grid_lines = self.load_grid_lines()
         self.grid = self.grid_from_starting_position()
         self.solution = [int(number) for number in self.settings['target_code'].split()]
         self.font = pygame.font.SysFont('Courier New', 70, bold=True)
-        self.buttons = None
+        # Rendered numbers, by (value, colour)
+        self.glyphs = {}
+        # Area last drawn for each cell's number, by (row, column)
+        self.glyph_rects = {}
+        # Cells to redraw - None to redraw the whole canvas
+        self.changed_cells = None
+        self.cell_order = [(row, column) for column in range(self.size) for row in range(self.size)]
+        self.add_hit_areas()
 
     def grid_from_starting_position(self):
-        result = []
-        for row in range(self.size):
-            result.append([])
-            line = self.settings['starting_position'][row]
-            for part in line.split():
-                result[row].append('' if part == '.' else int(part))
-        return result
+        return grid_from_settings(self.settings['starting_position'][:self.size])
 
     def load_grid_lines(self):
+        asset_index = self.location.game.asset_index
         result = dict(y=dict(), x=dict())
         for i in range(self.size):
-            image = Image.open(f'{self.image_path}h{i + 1}.png')
-            bbox = image.getbbox()
+            bbox = asset_index.bbox(f'{self.image_path}h{i + 1}.png')
             result['y'][i] = bbox[1], bbox[3]
 
-            image = Image.open(f'{self.image_path}v{i + 1}.png')
-            bbox = image.getbbox()
+            bbox = asset_index.bbox(f'{self.image_path}v{i + 1}.png')
             result['x'][i] = bbox[0], bbox[2]
 
         return result
 
-    def draw(self):
-        self.canvas.blit(self.background, (0, 0))
-        if self.done:
-            return self.canvas
-
-        for row in range(self.size):
-            for column in range(self.size):
-                x1, x2 = self.grid_lines['x'][column]
-                for row in range(self.size):
-                    y1, y2 = self.grid_lines['y'][row]
-                    font_image = self.font.render(str(self.grid[row][column]), True, 'Black')
-                    x = x1 // 2 + x2 // 2 - font_image.get_width() // 2
-                    self.canvas.blit(font_image, (x, y1 + 5))
+    def glyph(self, value, colour='Black'):
+        key = value, colour
+        if key not in self.glyphs:
+            self.glyphs[key] = self.location.game.assets.convert(self.font.render(str(value), True, colour))
+        return self.glyphs[key]
+
+    def glyph_rect(self, row, column, glyph):
+        x1, x2 = self.grid_lines['x'][column]
+        y1, y2 = self.grid_lines['y'][row]
+        x = x1 // 2 + x2 // 2 - glyph.get_width() // 2
+        return pygame.Rect(x, y1 + 5, glyph.get_width(), glyph.get_height())
+
+    def draw_cell(self, row, column):
+        glyph = self.glyph(self.grid[row][column])
+        new_rect = self.glyph_rect(row, column, glyph)
+        area = new_rect.union(self.glyph_rects.get((row, column), new_rect))
+        self.canvas.blit(self.background, area, area)
+        self.glyph_rects[(row, column)] = new_rect
+
+        # Redraw every number in the cleared area - long numbers can reach into other cells
+        for cell in self.cell_order:
+            rect = self.glyph_rects.get(cell)
+            if rect is not None and rect.colliderect(area):
+                self.canvas.blit(self.glyph(self.grid[cell[0]][cell[1]]), rect)
 
-        self.buttons = self.create_buttons()
+    def draw(self):
+        if self.changed_cells is None or self.done:
+            self.canvas.fill('Black')
+            self.canvas.blit(self.background, (0, 0))
+            self.glyph_rects = {}
+            if self.done:
+                return self.canvas
+            self.changed_cells = self.cell_order
+
+        for row, column in self.changed_cells:
+            self.draw_cell(row, column)
+        self.changed_cells = []
 
         return self.canvas
 
-    def create_buttons(self):
-        buttons = []
+    def add_hit_areas(self):
+        """
+        Every cell can be clicked, and the cells never move
+        """
         for row in range(self.size):
+            y1, y2 = self.grid_lines['y'][row]
             for column in range(self.size):
                 x1, x2 = self.grid_lines['x'][column]
-                for row in range(self.size):
-                    y1, y2 = self.grid_lines['y'][row]
-
-                    if self.grid[row][column] == '':
-                        continue
-
-                    buttons.append(Button(
-                        click_area=pygame.Rect(x1, y1, x2 - x1, y2 - y1),
-                        row=row,
-                        column=column
-                    ))
-        return buttons
+                self.hit_areas.add((row, column), pygame.Rect(x1, y1, x2 - x1, y2 - y1), (row, column))
+
+    def reload_images(self):
+        self.background = self.location.game.assets.load(self.image_path + 'background.png')
+        self.glyphs = {}
+        self.changed_cells = None
+        super().reload_images()
+
+    def save_state(self):
+        state = super().save_state()
+        state.update(grid=[list(row) for row in self.grid])
+        return state
+
+    def load_state(self, state):
+        grid = [list(row) for row in state['grid']]
+        if len(grid) != self.size or any(len(row) != self.size for row in grid):
+            raise ValueError('Saved grid does not fit this level')
+        self.grid = grid
+        self.changed_cells = None
+        super().load_state(state)
 
     def find_empty_spot(self):
         for row in range(self.size):
@@ -90,6 +113,14 @@ class Game(MiniGame):
                 if self.grid[row][column] == '':
                     return row, column
 
+    def hint(self):
+        """
+        Next (row, column) to move on a shortest route to the target code, or None
+        """
+        if self.done:
+            return None
+        return Puzzle(self.grid, self.solution).hint()
+
     def check_completion(self):
         for row in self.grid:
             if row == self.solution:
@@ -100,6 +131,7 @@ class Game(MiniGame):
         number = self.grid[row][column]
         self.grid[row][column] = ''
         self.grid[empty_row][empty_column] = number
+        changed_cells = [(row, column), (empty_row, empty_column)]
         for offset_row, offset_column in [(0, -1), (0, 1), (1, 0), (-1, 0)]:
             r = empty_row + offset_row
             c = empty_column + offset_column
@@ -108,6 +140,9 @@ class Game(MiniGame):
             if self.grid[r][c] == '':
                 continue
             self.grid[r][c] += number
+            changed_cells.append((r, c))
+        if self.changed_cells is not None:
+            self.changed_cells += changed_cells
 
         self.check_completion()
 
@@ -115,11 +150,10 @@ class Game(MiniGame):
         if self.done:
             return
         if mouse_event.type == pygame.MOUSEBUTTONUP:
-            mouse_position = self.location.mini_game_mouse_pos()
-            for button in self.buttons:
-                if button.was_clicked(mouse_position):
-                    self.move_number(row=button.row, column=button.column)
-                    return
+            cell = self.clicked_area()
+            if cell is not None and self.grid[cell[0]][cell[1]] != '':
+                self.move_number(row=cell[0], column=cell[1])
+                return
 
             # if mouse_position is None:
             #     return
@@ -0,0 +1,112 @@
+"""
+Breadth first solver for the number puzzle
+
+A state is a tuple of the board's values, row by row, with None for the blank.
+Values can grow without limit, so the search stops after max_moves moves or
+max_states distinct states; every state is only expanded once.
+"""
+BLANK = None
+
+
+class Puzzle:
+    def __init__(self, grid, target):
+        """
+        grid: rows of numbers, '' for the blank - as in mini_game_004.Game.grid
+        target: the row to make
+        """
+        self.size = len(grid)
+        self.target = tuple(target)
+        self.start = tuple(BLANK if value == '' else value for row in grid for value in row)
+        self.neighbours = []
+        for index in range(self.size * self.size):
+            row, column = divmod(index, self.size)
+            self.neighbours.append([
+                r * self.size + c
+                for r, c in [(row, column - 1), (row, column + 1), (row + 1, column), (row - 1, column)]
+                if 0 <= r < self.size and 0 <= c < self.size
+            ])
+
+    def moves(self, state):
+        """
+        (index of the number moved, new state) for every move - any number can move into the blank,
+        and is then added to the numbers next to the blank
+        """
+        blank = state.index(BLANK)
+        for index, value in enumerate(state):
+            if value is BLANK:
+                continue
+            new_state = list(state)
+            new_state[index] = BLANK
+            new_state[blank] = value
+            for neighbour in self.neighbours[blank]:
+                if new_state[neighbour] is not BLANK:
+                    new_state[neighbour] += value
+            yield index, tuple(new_state)
+
+    def finished(self, state):
+        return any(
+            state[start:start + self.size] == self.target
+            for start in range(0, self.size * self.size, self.size)
+        )
+
+    def solve(self, state=None, max_moves=12, max_states=2000000):
+        """
+        Shortest list of (row, column) moves, or None if there is none within the limits
+        """
+        start = self.start if state is None else state
+        if self.finished(start):
+            return []
+
+        previous = {start: None}
+        layer = [start]
+        for _ in range(max_moves):
+            next_layer = []
+            for state in layer:
+                for index, new_state in self.moves(state):
+                    if new_state in previous:
+                        continue
+                    previous[new_state] = (state, index)
+                    if self.finished(new_state):
+                        return self.path(previous, new_state)
+                    next_layer.append(new_state)
+                if len(previous) > max_states:
+                    return None
+            layer = next_layer
+        return None
+
+    def path(self, previous, state):
+        result = []
+        while previous[state] is not None:
+            state, index = previous[state]
+            result.append(divmod(index, self.size))
+        return result[::-1]
+
+    def hint(self, **limits):
+        """
+        Next (row, column) to move on a shortest route, or None
+        """
+        solution = self.solve(**limits)
+        return solution[0] if solution else None
+
+
+def grid_from_settings(starting_position):
+    return [
+        ['' if part == '.' else int(part) for part in line.split()]
+        for line in starting_position
+    ]
+
+
+def validate(settings, max_moves=12):
+    puzzle = Puzzle(
+        grid_from_settings(settings['starting_position']),
+        [int(number) for number in settings['target_code'].split()]
+    )
+    solution = puzzle.solve(max_moves=max_moves)
+    result = dict(
+        solvable=solution is not None,
+        moves=None if solution is None else len(solution),
+        hint=None if not solution else list(solution[0])
+    )
+    if solution is None:
+        result['note'] = f'no solution within {max_moves} moves'
+    return result
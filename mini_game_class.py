@@ -1,15 +1,117 @@
+import collections
+
 import pygame
 
 
+class HitAreas:
+    """
+    Click areas in 900x900 game coordinates, bucketed by grid square
+    A click only checks the few areas in its own square
+    """
+    def __init__(self, bucket_size=100):
+        self.bucket_size = bucket_size
+        # (rect, value) by key
+        self.areas = {}
+        # Keys of the areas that reach into each square, by (column, row)
+        self.buckets = collections.defaultdict(dict)
+
+    def squares(self, rect):
+        size = self.bucket_size
+        for column in range(rect.left // size, (rect.right - 1) // size + 1):
+            for row in range(rect.top // size, (rect.bottom - 1) // size + 1):
+                yield column, row
+
+    def add(self, key, rect, value):
+        self.remove(key)
+        rect = pygame.Rect(rect)
+        self.areas[key] = rect, value
+        for square in self.squares(rect):
+            self.buckets[square][key] = None
+
+    def remove(self, key):
+        if key not in self.areas:
+            return
+        rect, _ = self.areas.pop(key)
+        for square in self.squares(rect):
+            del self.buckets[square][key]
+
+    def clear(self):
+        self.areas = {}
+        self.buckets.clear()
+
+    def find(self, position):
+        """
+        Value of the first area added that contains position, or None
+        """
+        if position is None:
+            return None
+        x, y = int(position[0]), int(position[1])
+        bucket = self.buckets.get((x // self.bucket_size, y // self.bucket_size))
+        if not bucket:
+            return None
+        for key in bucket:
+            rect, value = self.areas[key]
+            if rect.collidepoint(x, y):
+                return value
+        return None
+
+
 class MiniGame:
+    # Set by mini-games that can draw straight into a window area of any size:
+    # they keep to 900x900 game coordinates and draw through to_canvas()
+    direct_rendering = False
+
     def __init__(self, location):
         self.canvas = pygame.Surface((900, 900))
+        self.canvas_scale = 1, 1
         self.done = False
+        # Set whenever the canvas needs redrawing
+        self.dirty = True
+        # Frames per second needed while animating, None when only input changes the game
+        self.frame_rate = None
         self.location = location
         self.settings = location.settings
         self.id = self.settings['mini_game_id']
         self.path = f'mini_game_{self.id:03}/'
         self.image_path = self.path + 'images/'
+        # What can be clicked - kept up to date by each mini-game as its board changes
+        self.hit_areas = HitAreas()
+
+    def set_canvas(self, canvas):
+        """
+        Draw into canvas from now on - any size, for mini-games with direct_rendering
+        """
+        self.canvas = canvas
+        self.canvas_scale = canvas.get_width() / 900, canvas.get_height() / 900
+        self.redraw_all()
+
+    def redraw_all(self):
+        """
+        The canvas got overwritten, so the next draw() has to paint all of it
+        """
+        self.dirty = True
+
+    def reload_images(self):
+        """
+        The display format changed - get the images again from game.assets
+        """
+        self.redraw_all()
+
+    def to_canvas(self, rect):
+        """
+        Canvas area for a rect in 900x900 game coordinates
+        """
+        rect = pygame.Rect(rect)
+        x_scale, y_scale = self.canvas_scale
+        left, top = round(rect.left * x_scale), round(rect.top * y_scale)
+        right, bottom = round(rect.right * x_scale), round(rect.bottom * y_scale)
+        return pygame.Rect(left, top, right - left, bottom - top)
+
+    def clicked_area(self):
+        """
+        Value of the hit area under the mouse, or None
+        """
+        return self.hit_areas.find(self.location.mini_game_mouse_pos())
 
     def draw(self):
         pass
@@ -23,8 +125,17 @@ class MiniGame:
     def handle_key_event(self, key_event):
         pass
 
+    def save_state(self):
+        """
+        What a save file needs to restore this mini-game - only lists, numbers, strings and booleans
+        """
+        return dict(done=self.done)
+
+    def load_state(self, state):
+        self.done = state['done']
+        self.redraw_all()
+
     def game_completion(self):
         self.done = True
-        for location in self.location.next_locations:
-            if location is not None:
-                location.unlocked = True
+        self.location.game.locations.unlock_next(self.location.id)
+        self.location.game.save_game.save()
@@ -0,0 +1,33 @@
+import importlib
+import os
+import threading
+
+
+class MiniGameRegistry:
+    """
+    The mini-game class for each mini_game_id, from the mini_game_xxx packages
+    Each package is imported once, on first use - from any thread
+    """
+    def __init__(self, path='.'):
+        self.package_names = {
+            int(name.split('_')[2]): name
+            for name in os.listdir(path)
+            if name.startswith('mini_game_') and os.path.isfile(os.path.join(path, name, '__init__.py'))
+        }
+        self.classes = {}
+        self.lock = threading.Lock()
+
+    def game_class(self, mini_game_id):
+        assert isinstance(mini_game_id, int)
+        with self.lock:
+            if mini_game_id not in self.classes:
+                if mini_game_id not in self.package_names:
+                    raise KeyError(f'No mini_game_{mini_game_id:03} package')
+                self.classes[mini_game_id] = importlib.import_module(self.package_names[mini_game_id]).Game
+        return self.classes[mini_game_id]
+
+    def create(self, location):
+        mini_game_id = location.settings.get('mini_game_id')
+        if mini_game_id is None:
+            return None
+        return self.game_class(mini_game_id)(location)
@@ -0,0 +1,37 @@
+"""
+Decode every image the game loads into one archive, for fast startup and location changes
+
+python pack_assets.py
+
+Run again after changing images - until then, changed images load from their PNG files
+"""
+import fnmatch
+
+from asset_archive_class import AssetArchive, ARCHIVE_FILENAME
+from asset_index_class import AssetIndex
+
+# Only their bounding boxes get used, which the asset index has
+BBOX_ONLY = [
+    'locations/*/images/mini_game_area.png',
+    'mini_game_004/images/*/[hv][0-9].png',
+]
+
+# The game only uses these scaled to the frame size, so store them that way
+FRAME_SIZED = [
+    'images/map_background.png',
+    'locations/*/images/map.png',
+]
+
+index = AssetIndex()
+index.build()
+filenames = [
+    filename for filename in index.entries
+    if not any(fnmatch.fnmatch(filename, pattern) for pattern in BBOX_ONLY)
+]
+sizes = {
+    filename: (1920, 1080) for filename in filenames
+    if any(fnmatch.fnmatch(filename, pattern) for pattern in FRAME_SIZED)
+}
+entries = AssetArchive.pack(index, filenames, sizes=sizes)
+index.save()
+print(f'{len(entries)} images in {ARCHIVE_FILENAME}')
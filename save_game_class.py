@@ -0,0 +1,115 @@
+import concurrent.futures
+import json
+import os
+import struct
+import time
+import zlib
+
+
+class SaveGame:
+    """
+    Progress - which locations are unlocked, and where each mini-game is at - saved to a small file
+    The state is copied during the frame (cheap), encoded and written by a background thread
+
+    File format: MAGIC, format version (2 bytes, little endian), zlib compressed JSON
+    """
+    MAGIC = b'PW31SAVE'
+    VERSION = 1
+
+    def __init__(self, game, enabled=True, filename='save_game.bin', interval=30000):
+        self.game = game
+        self.enabled = enabled
+        self.filename = filename
+        # Milliseconds between autosaves
+        self.interval = interval
+        self.last_save_time = time.perf_counter()
+        self.last_state = None
+        self.writer = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+
+    def state(self):
+        return dict(
+            active_location_id=self.game.active_location.id,
+            locations=[[location.id] + list(location.save_state()) for location in self.game.locations],
+        )
+
+    def save(self):
+        """
+        Queue a save, unless nothing changed since the last one
+        """
+        self.last_save_time = time.perf_counter()
+        if not self.enabled:
+            return
+        state = self.state()
+        if state == self.last_state:
+            return
+        self.last_state = state
+        self.writer.submit(self.write, state)
+
+    def update(self):
+        if (time.perf_counter() - self.last_save_time) * 1000 >= self.interval:
+            self.save()
+
+    def encode(self, state):
+        data = json.dumps(state, separators=(',', ':')).encode()
+        return self.MAGIC + struct.pack('<H', self.VERSION) + zlib.compress(data)
+
+    def write(self, state):
+        temporary_filename = self.filename + '.tmp'
+        with open(temporary_filename, 'wb') as output_file:
+            output_file.write(self.encode(state))
+            output_file.flush()
+            os.fsync(output_file.fileno())
+        os.replace(temporary_filename, self.filename)
+
+    def read(self):
+        """
+        Saved state, or None when there is no save - or one this version cannot read
+        """
+        try:
+            with open(self.filename, 'rb') as input_file:
+                data = input_file.read()
+        except FileNotFoundError:
+            return None
+
+        header_size = len(self.MAGIC) + 2
+        if data[:len(self.MAGIC)] != self.MAGIC:
+            return None
+        try:
+            version, = struct.unpack('<H', data[len(self.MAGIC):header_size])
+            if version != self.VERSION:
+                return None
+            return json.loads(zlib.decompress(data[header_size:]))
+        except (struct.error, zlib.error, ValueError):
+            return None
+
+    def load(self):
+        """
+        Restore the saved locations - mini-games pick up their saved state when they get created
+        Returns the saved active location, or None
+        """
+        if not self.enabled:
+            return None
+        state = self.read()
+        if state is None:
+            return None
+        try:
+            saved_locations = [
+                (self.game.locations.get(id), unlocked, first_visit, show_intro_text, mini_game_state)
+                for id, unlocked, first_visit, show_intro_text, mini_game_state in state['locations']
+            ]
+            location = self.game.locations.get(state['active_location_id'])
+        except (KeyError, TypeError, ValueError):
+            # Not the shape this version writes
+            return None
+
+        for saved_location, *location_state in saved_locations:
+            if saved_location is not None:
+                saved_location.load_state(*location_state)
+        self.last_state = state
+
+        if location is None or not location.unlocked:
+            return None
+        return location
+
+    def shutdown(self):
+        self.writer.shutdown(wait=True)
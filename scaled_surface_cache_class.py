@@ -0,0 +1,43 @@
+import pygame
+
+from surface_loader_class import surface_bytes
+
+
+class ScaledSurfaceCache:
+    """
+    Scaled copies of surfaces, one per key, reused for as long as the source version and target size stay the same
+    Cleared whenever the window size changes
+    """
+    def __init__(self):
+        self.entries = {}
+
+    def get(self, key, version, size, source):
+        """
+        source: function returning the unscaled surface, only called when the cached copy is out of date
+        """
+        size = tuple(size)
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] == (version, size):
+            return entry[1]
+
+        image = source()
+        scaled = image.get_size() != size
+        if scaled:
+            image = pygame.transform.scale(image, size)
+        self.entries[key] = ((version, size), image, scaled)
+        return image
+
+    def discard(self, key):
+        self.entries.pop(key, None)
+
+    def keys(self):
+        return list(self.entries)
+
+    def memory_size(self):
+        """
+        Bytes used by the scaled copies - sources already the right size are cached as they are, and counted elsewhere
+        """
+        return sum(surface_bytes(image) for _, image, scaled in self.entries.values() if scaled)
+
+    def clear(self):
+        self.entries.clear()
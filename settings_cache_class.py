@@ -0,0 +1,91 @@
+import copy
+import glob
+import os
+import pickle
+
+import flatten_dict
+import yaml
+
+# libyaml is many times faster, when PyYAML was built with it
+YAML_LOADER = getattr(yaml, 'CLoader', yaml.Loader)
+
+
+def load_yaml(filename):
+    with open(filename) as input_file:
+        return yaml.load(input_file, Loader=YAML_LOADER)
+
+
+class SettingsCache:
+    """
+    settings.yml, local_settings.yml and every location's settings.yml, compiled into one pickle
+    Recompiled only when one of those files is added, removed or changed - otherwise nothing gets parsed
+    """
+    VERSION = 1
+
+    def __init__(self, filename='settings_cache.bin'):
+        self.filename = filename
+        self.snapshot = None
+
+    @staticmethod
+    def source_mtimes():
+        result = {}
+        for filename in ['settings.yml', 'local_settings.yml'] + sorted(glob.glob('locations/location_*/settings.yml')):
+            try:
+                result[filename] = os.stat(filename).st_mtime_ns
+            except FileNotFoundError:
+                result[filename] = None
+        return result
+
+    def load(self):
+        sources = self.source_mtimes()
+        try:
+            with open(self.filename, 'rb') as input_file:
+                snapshot = pickle.load(input_file)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            snapshot = None
+
+        if not isinstance(snapshot, dict) or snapshot.get('version') != self.VERSION or snapshot.get('sources') != sources:
+            snapshot = self.compile(sources)
+            self.save(snapshot)
+        self.snapshot = snapshot
+
+    def compile(self, sources):
+        settings = load_yaml('settings.yml')
+        local_settings = load_yaml('local_settings.yml') if sources['local_settings.yml'] is not None else None
+        if local_settings:
+            settings = flatten_dict.flatten(settings)
+            settings.update(flatten_dict.flatten(local_settings))
+            settings = flatten_dict.unflatten(settings)
+
+        locations = {
+            filename: load_yaml(filename)
+            for filename in sources
+            if filename.startswith('locations/')
+        }
+        return dict(version=self.VERSION, sources=sources, settings=settings, locations=locations)
+
+    def save(self, snapshot):
+        temporary_filename = self.filename + '.tmp'
+        try:
+            with open(temporary_filename, 'wb') as output_file:
+                pickle.dump(snapshot, output_file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporary_filename, self.filename)
+        except OSError:
+            # Read-only install - compile again next time
+            pass
+
+    @property
+    def settings(self):
+        if self.snapshot is None:
+            self.load()
+        return self.snapshot['settings']
+
+    def location_settings(self, filename):
+        """
+        Each caller gets its own copy, to add to or change
+        """
+        if self.snapshot is None:
+            self.load()
+        if filename not in self.snapshot['locations']:
+            return load_yaml(filename)
+        return copy.deepcopy(self.snapshot['locations'][filename])
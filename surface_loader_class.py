@@ -0,0 +1,122 @@
+import collections
+import concurrent.futures
+
+import pygame
+
+
+def surface_bytes(surface):
+    return surface.get_pitch() * surface.get_height()
+
+
+class LazySurface:
+    """
+    Stand-in for an image file, decoded on first use or in the background after prefetch()
+    Use get() to obtain the actual pygame Surface
+    size: scale the image to this size when loading it
+    """
+    def __init__(self, loader, filename, size=None):
+        self.loader = loader
+        self.filename = filename
+        self.size = size
+        self.surface = None
+        self.future = None
+        # AssetManager version the surface was loaded for
+        self.version = None
+
+    def load(self):
+        surface = self.loader.assets.load(self.filename)
+        if self.size is not None and surface.get_size() != self.size:
+            surface = pygame.transform.scale(surface, self.size)
+        return surface
+
+    def prefetch(self):
+        if self.surface is None and self.future is None:
+            self.version = self.loader.assets.version
+            self.future = self.loader.pool.submit(self.load)
+            self.loader.touch(self)
+
+    def get(self):
+        if self.version != self.loader.assets.version:
+            # Loaded for an earlier display format
+            self.evict()
+        if self.surface is None:
+            self.version = self.loader.assets.version
+            if self.future is None:
+                self.surface = self.load()
+            else:
+                self.surface = self.future.result()
+                self.future = None
+        self.loader.touch(self)
+        return self.surface
+
+    def memory_size(self):
+        """
+        Bytes used - or about to be, while it is still loading
+        """
+        if self.surface is not None:
+            return surface_bytes(self.surface)
+        width, height = self.size or self.loader.asset_index.size(self.filename)
+        return width * height * 4
+
+    def evict(self):
+        if self.future is not None:
+            self.future.cancel()
+            self.future = None
+        self.surface = None
+
+
+class SurfaceLoader:
+    """
+    Creates LazySurfaces, decodes them in a thread pool, and keeps them in memory
+    up to memory_budget bytes - least recently used ones get evicted first
+    Pinned surfaces are never evicted
+    """
+    def __init__(self, assets, asset_index, memory_budget, workers=2):
+        self.assets = assets
+        self.asset_index = asset_index
+        self.memory_budget = memory_budget
+        self.pool = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+        # Bytes used by each loaded (or loading) surface, least recently used first
+        self.resident = collections.OrderedDict()
+        self.resident_bytes = 0
+        self.pinned = set()
+
+    def lazy(self, filename, size=None):
+        return LazySurface(self, filename, size)
+
+    def touch(self, lazy_surface):
+        memory_size = lazy_surface.memory_size()
+        self.resident_bytes += memory_size - self.resident.get(lazy_surface, 0)
+        self.resident[lazy_surface] = memory_size
+        self.resident.move_to_end(lazy_surface)
+        if self.resident_bytes > self.memory_budget:
+            self.evict_over_budget(keep=lazy_surface)
+
+    def pin(self, lazy_surfaces):
+        """
+        Keep these in memory from now on, instead of the ones pinned before
+        """
+        self.pinned = set(lazy_surfaces)
+        self.evict_over_budget()
+
+    def evict_over_budget(self, keep=None):
+        for lazy_surface in list(self.resident):
+            if self.resident_bytes <= self.memory_budget:
+                return
+            if lazy_surface is keep or lazy_surface in self.pinned:
+                continue
+            self.resident_bytes -= self.resident.pop(lazy_surface)
+            lazy_surface.evict()
+
+    def report(self):
+        """
+        (file name, bytes, pinned) for every surface in memory, largest first, then by name
+        """
+        return sorted(
+            ((lazy_surface.filename, memory_size, lazy_surface in self.pinned)
+             for lazy_surface, memory_size in self.resident.items()),
+            key=lambda line: (-line[1], line[0])
+        )
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
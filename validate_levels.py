@@ -0,0 +1,64 @@
+"""
+Check that every mini-game level can be solved, one process per location
+
+python validate_levels.py [--mini-game ID] [--processes N]
+"""
+import argparse
+import concurrent.futures
+import glob
+import sys
+
+import yaml
+
+import mini_game_003.solver
+import mini_game_004.solver
+
+VALIDATORS = {
+    3: mini_game_003.solver.validate,
+    4: mini_game_004.solver.validate,
+}
+
+
+def validate_location(filename):
+    with open(filename) as input_file:
+        settings = yaml.load(input_file, Loader=yaml.Loader)
+    mini_game_id = settings.get('mini_game_id')
+    result = VALIDATORS[mini_game_id](settings)
+    result.update(location=filename.split('/')[-2], mini_game_id=mini_game_id)
+    return result
+
+
+def level_filenames(mini_game_ids):
+    result = []
+    for filename in sorted(glob.glob('locations/location_*/settings.yml')):
+        with open(filename) as input_file:
+            settings = yaml.load(input_file, Loader=yaml.Loader)
+        if settings.get('mini_game_id') in mini_game_ids:
+            result.append(filename)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check that every mini-game level can be solved')
+    parser.add_argument('--mini-game', type=int, action='append', choices=sorted(VALIDATORS))
+    parser.add_argument('--processes', type=int, default=None)
+    args = parser.parse_args()
+
+    filenames = level_filenames(args.mini_game or list(VALIDATORS))
+    failures = 0
+    with concurrent.futures.ProcessPoolExecutor(max_workers=args.processes) as executor:
+        for result in executor.map(validate_location, filenames):
+            if result['solvable']:
+                print(f"{result['location']}  mini_game_{result['mini_game_id']:03}  "
+                      f"solvable in {result['moves']} moves, first move {result['hint']}")
+            else:
+                failures += 1
+                print(f"{result['location']}  mini_game_{result['mini_game_id']:03}  NOT SOLVABLE "
+                      f"{result.get('note', '')}")
+
+    print(f'{len(filenames)} levels checked, {failures} not solvable')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
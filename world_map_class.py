@@ -0,0 +1,61 @@
+import pygame
+
+
+class WorldMap:
+    """
+    The map overlay, composed once and then only redrawn around locations
+    that got unlocked or became (in)active
+    """
+    def __init__(self, game):
+        self.game = game
+        self.background = self.load_background()
+        self.image = None
+        self.dirty_rects = []
+
+    def load_background(self):
+        background = self.game.assets.load('images/map_background.png')
+        if background.get_size() != (1920, 1080):
+            background = pygame.transform.scale(background, (1920, 1080))
+        return background
+
+    def reload_images(self):
+        self.background = self.load_background()
+        self.invalidate()
+
+    def invalidate(self, location=None):
+        if location is None:
+            self.image = None
+            rect = None
+        else:
+            rect = location.map_area
+            self.dirty_rects.append(rect)
+        if self.game.show_map:
+            self.game.compositor.invalidate(rect)
+
+    def draw_locations(self, area):
+        for location in self.game.locations:
+            if not location.unlocked:
+                continue
+            if not location.map_area.colliderect(area):
+                continue
+            if self.game.active_location == location:
+                # TODO: Room within room - make white when not active
+                pygame.draw.rect(self.image, 'light green', location.map_button_area)
+            self.image.blit(location.map_image, location.map_area, location.map_area)
+
+    def draw(self):
+        if self.image is None:
+            self.image = self.background.copy()
+            self.dirty_rects = []
+            self.draw_locations(self.image.get_rect())
+
+        for rect in self.dirty_rects:
+            self.image.set_clip(rect)
+            # The background is slightly transparent, so clear the area rather than blend onto it
+            self.image.fill((0, 0, 0, 0), rect)
+            self.image.blit(self.background, rect, rect)
+            self.draw_locations(rect)
+        self.image.set_clip(None)
+        self.dirty_rects = []
+
+        return self.image